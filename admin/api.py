@@ -0,0 +1,67 @@
+from flask import Blueprint, request, jsonify, Response
+import hmac
+import threading
+from config import ADMIN_TOKEN
+from sampling_profiler import SamplingProfiler
+
+# Create the blueprint
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+# Only one profile may run at a time per worker
+profile_lock = threading.Lock()
+
+# Threads currently serving a request; only these are profiled
+request_threads = set()
+
+# Upper bounds so a single request cannot tie up a worker for long
+MAX_PROFILE_SECONDS = 60
+MIN_INTERVAL_MS = 1
+
+def is_admin():
+    """Check the request's X-Admin-Token header against ADMIN_TOKEN."""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+@admin_bp.before_app_request
+def track_request_thread():
+    """Mark the current thread as serving a request."""
+    request_threads.add(threading.get_ident())
+
+@admin_bp.teardown_app_request
+def untrack_request_thread(exception=None):
+    """Mark the current thread as idle again."""
+    request_threads.discard(threading.get_ident())
+
+@admin_bp.route('/profile', methods=['POST'])
+def profile():
+    """Sample the threads serving other requests in this worker and return the hot stacks."""
+    if not is_admin():
+        return jsonify({'error': 'Admin token required'}), 403
+    
+    try:
+        seconds = float(request.args.get('seconds', 5))
+        interval_ms = float(request.args.get('interval_ms', 5))
+        top = int(request.args.get('top', 20))
+    except ValueError:
+        return jsonify({'error': 'seconds, interval_ms and top must be numbers'}), 400
+    
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        return jsonify({'error': f'seconds must be between 0 and {MAX_PROFILE_SECONDS}'}), 400
+    interval_ms = max(interval_ms, MIN_INTERVAL_MS)
+    
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({'error': 'A profile is already running'}), 409
+    
+    try:
+        profiler = SamplingProfiler(interval=interval_ms / 1000.0, active_threads=request_threads)
+        summary = profiler.run(seconds)
+    finally:
+        profile_lock.release()
+    
+    # Plain collapsed stacks can be piped straight into flamegraph.pl
+    if request.args.get('format') == 'collapsed':
+        return Response(profiler.collapsed() + '\n', mimetype='text/plain')
+    
+    summary['top_functions'] = profiler.top_functions(top)
+    summary['collapsed'] = profiler.collapsed()
+    return jsonify(summary)
@@ -0,0 +1,483 @@
+import os
+import time
+import threading
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no cross-process compaction lock, so run a single worker there
+    fcntl = None
+
+# Numeric columns stored for every logged turn, in on-disk order
+NUMERIC_COLUMNS = ['timestamp', 'duration', 'query_len', 'response_len']
+
+# Low-cardinality string columns stored as integer codes into a dictionary
+DICTIONARY_COLUMNS = ['session_id', 'intent', 'city']
+
+COLUMN_DTYPES = {
+    'timestamp': np.int64,
+    'duration': np.int32,
+    'query_len': np.int32,
+    'response_len': np.int32,
+    'session_id': np.uint32,
+    'intent': np.uint32,
+    'city': np.uint32,
+}
+
+def segment_rows(filename):
+    """Return the row count encoded in a segment file name, or None for older names."""
+    parts = filename[:-len('.npz')].split('_')
+    return int(parts[3]) if len(parts) == 4 and parts[3].isdigit() else None
+
+class ConversationAnalytics:
+    def __init__(self, data_dir='analytics_data', segment_size=65536, seal_interval=10, compact_files=16):
+        """
+        Initialize the local columnar analytics store.
+
+        Rows are buffered in memory and sealed into immutable, append-only
+        segments of at most `segment_size` rows. Each sealed segment is
+        written to `data_dir` as a single .npz file that carries its own
+        string dictionaries, so several worker processes can share one
+        directory. Segment files are only read on the first query, not
+        when a worker starts.
+
+        A worker's buffered rows are only visible to that worker, so a
+        background thread also seals the buffer every `seal_interval`
+        seconds. Queries in any worker therefore include rows logged by the
+        others within about `seal_interval` seconds. Once `compact_files`
+        small segments have piled up, the same thread merges them into
+        files of up to `segment_size` rows.
+
+        Args:
+            data_dir (str): Directory holding the segment files
+            segment_size (int): Maximum number of rows per sealed segment
+            seal_interval (float): Seconds between seals of a non-empty
+                buffer (None to seal only when full or flushed)
+            compact_files (int): Number of small segment files that
+                triggers a merge
+        """
+        self.data_dir = data_dir
+        self.segment_size = segment_size
+        self.seal_interval = seal_interval
+        self.compact_files = compact_files
+        self.sealer = None
+        self.lock = threading.Lock()
+
+        # Sealed segments by file name ({column: ndarray}), and every file
+        # already loaded or replaced by a merged file that was loaded
+        self.segments = {}
+        self.loaded_files = set()
+
+        # Per-column dictionaries: values list and value -> code lookup
+        self.dictionaries = {name: [] for name in DICTIONARY_COLUMNS}
+        self.codes = {name: {} for name in DICTIONARY_COLUMNS}
+
+        # Rows not yet sealed into a segment
+        self.buffer = {name: [] for name in COLUMN_DTYPES}
+
+        try:
+            os.makedirs(self.data_dir, exist_ok=True)
+        except OSError as e:
+            print(f"Error creating analytics directory: {e}")
+
+    def _segment_files(self):
+        """Return the names of the segment files in the data directory, oldest first."""
+        return sorted(filename for filename in os.listdir(self.data_dir)
+                      if filename.startswith('segment_') and filename.endswith('.npz'))
+
+    def _load_new_segments(self):
+        """
+        Load segments written since the last call, including other workers' segments.
+
+        Files are read without holding the lock. A merged file replaces the
+        segments it was built from, so their rows are never counted twice.
+        """
+        for filename in self._segment_files():
+            if filename in self.loaded_files:
+                continue
+            try:
+                with np.load(os.path.join(self.data_dir, filename)) as stored:
+                    stored = {key: stored[key] for key in stored.files}
+            except FileNotFoundError:
+                # Merged into another file since the directory was listed
+                continue
+
+            with self.lock:
+                if filename in self.loaded_files:
+                    continue
+                segment = {name: stored[name] for name in NUMERIC_COLUMNS}
+                # Translate the segment's own codes into this process's dictionaries
+                for name in DICTIONARY_COLUMNS:
+                    mapping = np.array([self._encode(name, value) for value in stored[f'{name}_values'].tolist()],
+                                       dtype=COLUMN_DTYPES[name])
+                    segment[name] = mapping[stored[name]] if len(mapping) else stored[name].astype(COLUMN_DTYPES[name])
+                for source in stored.get('sources', np.empty(0, dtype=str)).tolist():
+                    self.segments.pop(source, None)
+                    self.loaded_files.add(source)
+                self.segments[filename] = segment
+                self.loaded_files.add(filename)
+
+    def _encode(self, column, value):
+        """Return the dictionary code for a value, adding it if unseen."""
+        value = value if value else 'N/A'
+        code = self.codes[column].get(value)
+        if code is None:
+            code = len(self.dictionaries[column])
+            self.dictionaries[column].append(value)
+            self.codes[column][value] = code
+        return code
+
+    def _seal(self):
+        """
+        Turn the current buffer into an immutable segment. Caller holds the lock.
+
+        Returns:
+            tuple: (filename, stored arrays) to pass to _write_segment once
+                the lock is released
+        """
+        segment = {name: np.asarray(values, dtype=COLUMN_DTYPES[name])
+                   for name, values in self.buffer.items()}
+        self.buffer = {name: [] for name in COLUMN_DTYPES}
+        return self._add_segment(segment)
+
+    def _add_segment(self, segment):
+        """Add a sealed segment and name its file. Caller holds the lock."""
+        # Unique per process, sorted by creation time, and ending in the row
+        # count so the compactor can find small segments without opening them
+        filename = f"segment_{time.time_ns():020d}_{os.getpid()}_{len(segment['timestamp'])}.npz"
+        self.segments[filename] = segment
+        # Claimed before the file exists, so this process never loads it back
+        self.loaded_files.add(filename)
+
+        stored = {name: segment[name] for name in NUMERIC_COLUMNS}
+        for name in DICTIONARY_COLUMNS:
+            # Store compact per-segment codes plus the strings they stand for
+            used, local_codes = np.unique(segment[name], return_inverse=True)
+            stored[name] = local_codes.astype(COLUMN_DTYPES[name])
+            stored[f'{name}_values'] = np.array([self.dictionaries[name][code] for code in used.tolist()], dtype=str)
+        return filename, stored
+
+    def _write_segment(self, filename, stored):
+        """Write one segment file, returning whether it succeeded. Called without the lock held."""
+        path = os.path.join(self.data_dir, filename)
+        try:
+            # Write to a temporary name so other workers never load a partial file
+            with open(path + '.tmp', 'wb') as f:
+                np.savez(f, **stored)
+            os.replace(path + '.tmp', path)
+            return True
+        except OSError as e:
+            print(f"Error writing analytics segment: {e}")
+            return False
+
+    def log_conversation(self, session_id, user_query, bot_response, intent, city=None, duration=None):
+        """
+        Record one conversation turn in the analytics store.
+
+        Takes the same arguments as PostCallLogger.log_conversation, but keeps
+        only the lengths of the query and response, not their text.
+
+        Args:
+            session_id (str): Unique session identifier
+            user_query (str): The user's last query
+            bot_response (str): The bot's last response
+            intent (str): Detected intent (booking, faq, etc.)
+            city (str, optional): City if applicable
+            duration (int, optional): Duration of conversation in seconds
+
+        Returns:
+            bool: True once the row has been recorded
+        """
+        sealed = None
+        with self.lock:
+            if self.sealer is None and self.seal_interval:
+                # Started on first use so it runs in the worker, not a pre-fork master
+                self.sealer = threading.Thread(target=self._seal_loop, name='analytics-sealer', daemon=True)
+                self.sealer.start()
+
+            self.buffer['timestamp'].append(int(time.time()))
+            self.buffer['duration'].append(int(duration) if duration else 0)
+            self.buffer['query_len'].append(len(user_query or ''))
+            self.buffer['response_len'].append(len(bot_response or ''))
+            self.buffer['session_id'].append(self._encode('session_id', session_id))
+            self.buffer['intent'].append(self._encode('intent', intent))
+            self.buffer['city'].append(self._encode('city', city))
+
+            if len(self.buffer['timestamp']) >= self.segment_size:
+                sealed = self._seal()
+        if sealed:
+            self._write_segment(*sealed)
+        return True
+
+    def _seal_loop(self):
+        """Seal the buffer every seal_interval seconds so other workers can read it, then compact."""
+        while True:
+            time.sleep(self.seal_interval)
+            self.flush()
+            try:
+                self.compact()
+            except (OSError, ValueError) as e:
+                print(f"Error compacting analytics segments: {e}")
+
+    def flush(self):
+        """Seal any buffered rows into a segment so they survive a restart."""
+        sealed = None
+        with self.lock:
+            if self.buffer['timestamp']:
+                sealed = self._seal()
+        if sealed:
+            self._write_segment(*sealed)
+
+    def compact(self):
+        """
+        Merge small segment files, from every worker, into files of up to segment_size rows.
+
+        Only one worker compacts at a time; the others skip the round. Each
+        merged file lists the files it replaces (and the ones those
+        replaced), and is written before they are removed, so a reader sees
+        every row exactly once whichever files it finds.
+
+        Returns:
+            int: Number of small files merged away
+        """
+        with open(os.path.join(self.data_dir, '.compact.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return 0
+
+            filenames = self._segment_files()
+            small = [filename for filename in filenames
+                     if (segment_rows(filename) or self.segment_size) < self.segment_size]
+            if len(small) < self.compact_files:
+                return 0
+
+            # Files left behind by a compaction that stopped before removing them
+            superseded = set()
+            for filename in filenames:
+                with np.load(os.path.join(self.data_dir, filename)) as stored:
+                    if 'sources' in stored.files:
+                        superseded.update(stored['sources'].tolist())
+            for filename in superseded.intersection(small):
+                os.remove(os.path.join(self.data_dir, filename))
+            small = [filename for filename in small if filename not in superseded]
+
+            # Pack the small files, oldest first, into batches of at most segment_size rows
+            batches = [[]]
+            batch_rows = 0
+            for filename in small:
+                rows = segment_rows(filename)
+                if batch_rows + rows > self.segment_size:
+                    batches.append([])
+                    batch_rows = 0
+                batches[-1].append(filename)
+                batch_rows += rows
+
+            merged_away = 0
+            for batch in batches:
+                if len(batch) < 2:
+                    continue
+                if not self._write_segment(*self._merge_files(batch)):
+                    break
+                for source in batch:
+                    os.remove(os.path.join(self.data_dir, source))
+                merged_away += len(batch)
+            return merged_away
+
+    def _merge_files(self, filenames):
+        """Combine segment files into the contents of one merged file."""
+        parts = []
+        sources = set(filenames)
+        for filename in filenames:
+            with np.load(os.path.join(self.data_dir, filename)) as stored:
+                parts.append({key: stored[key] for key in stored.files})
+            sources.update(parts[-1].get('sources', np.empty(0, dtype=str)).tolist())
+
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in NUMERIC_COLUMNS}
+        for name in DICTIONARY_COLUMNS:
+            # Re-code every part against one dictionary for the merged file
+            codes = {}
+            columns = []
+            for part in parts:
+                mapping = np.array([codes.setdefault(value, len(codes)) for value in part[f'{name}_values'].tolist()],
+                                   dtype=COLUMN_DTYPES[name])
+                columns.append(mapping[part[name]] if len(mapping) else part[name].astype(COLUMN_DTYPES[name]))
+            merged[name] = np.concatenate(columns)
+            merged[f'{name}_values'] = np.array(list(codes), dtype=str)
+        merged['sources'] = np.array(sorted(sources), dtype=str)
+
+        filename = f"segment_{time.time_ns():020d}_{os.getpid()}_{len(merged['timestamp'])}.npz"
+        return filename, merged
+
+    def bulk_load(self, columns):
+        """
+        Append many rows at once, e.g. when backfilling from Google Sheets.
+
+        Args:
+            columns (dict): Column name -> sequence of raw values. String
+                columns hold strings, numeric columns hold numbers. All
+                sequences must have the same length.
+
+        Returns:
+            int: Number of rows appended
+        """
+        num_rows = len(columns['timestamp'])
+        sealed = []
+        with self.lock:
+            if self.buffer['timestamp']:
+                sealed.append(self._seal())
+
+            encoded = {}
+            for name in NUMERIC_COLUMNS:
+                values = columns.get(name)
+                if values is None:
+                    encoded[name] = np.zeros(num_rows, dtype=COLUMN_DTYPES[name])
+                else:
+                    encoded[name] = np.asarray(values, dtype=COLUMN_DTYPES[name])
+
+            for name in DICTIONARY_COLUMNS:
+                values = columns.get(name)
+                if values is None:
+                    values = ['N/A'] * num_rows
+                # Encode each distinct value once, then map all rows at once
+                uniques, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+                mapping = np.array([self._encode(name, value) for value in uniques.tolist()],
+                                   dtype=COLUMN_DTYPES[name])
+                encoded[name] = mapping[inverse]
+
+            for start in range(0, num_rows, self.segment_size):
+                segment = {name: values[start:start + self.segment_size]
+                           for name, values in encoded.items()}
+                sealed.append(self._add_segment(segment))
+
+        for filename, stored in sealed:
+            self._write_segment(filename, stored)
+        return num_rows
+
+    def _snapshot(self, columns, since=None, until=None):
+        """
+        Concatenate the requested columns across all segments and the buffer.
+
+        Returns:
+            dict: Column name -> ndarray, filtered to [since, until)
+        """
+        try:
+            self._load_new_segments()
+        except (OSError, ValueError) as e:
+            print(f"Error loading analytics segments: {e}")
+
+        with self.lock:
+            segments = list(self.segments.values())
+            if self.buffer['timestamp']:
+                segments.append({name: np.asarray(values, dtype=COLUMN_DTYPES[name])
+                                 for name, values in self.buffer.items()})
+
+        needed = set(columns) | {'timestamp'}
+        if not segments:
+            return {name: np.empty(0, dtype=COLUMN_DTYPES[name]) for name in needed}
+
+        data = {name: np.concatenate([segment[name] for segment in segments]) for name in needed}
+
+        if since is not None or until is not None:
+            mask = np.ones(len(data['timestamp']), dtype=bool)
+            if since is not None:
+                mask &= data['timestamp'] >= int(since)
+            if until is not None:
+                mask &= data['timestamp'] < int(until)
+            data = {name: values[mask] for name, values in data.items()}
+        return data
+
+    def aggregate(self, group_by=None, bucket_seconds=None, metric=None, since=None, until=None):
+        """
+        Run a vectorized group-by over the stored turns.
+
+        Groups are keyed by the requested dictionary columns and, when
+        `bucket_seconds` is given, by the start of each time bucket.
+
+        Args:
+            group_by (list, optional): Dictionary columns to group on
+                (session_id, intent, city)
+            bucket_seconds (int, optional): Width of the time buckets, in
+                seconds (must be positive)
+            metric (str, optional): Numeric column to sum and average
+                (duration, query_len, response_len)
+            since (int, optional): Only include rows at or after this epoch second
+            until (int, optional): Only include rows before this epoch second
+
+        Returns:
+            list: One dict per non-empty group with its keys, count and,
+                if requested, the sum and mean of `metric`
+        """
+        group_by = list(group_by or [])
+        for name in group_by:
+            if name not in DICTIONARY_COLUMNS:
+                raise ValueError(f'Cannot group by column: {name}')
+        if metric is not None and metric not in NUMERIC_COLUMNS:
+            raise ValueError(f'Unknown metric column: {metric}')
+        if bucket_seconds is not None and int(bucket_seconds) <= 0:
+            raise ValueError('bucket must be a positive number of seconds')
+
+        data = self._snapshot(group_by + ([metric] if metric else []), since, until)
+        num_rows = len(data['timestamp'])
+        if num_rows == 0:
+            return []
+
+        # Build one mixed-radix key per row from the group columns
+        keys = np.zeros(num_rows, dtype=np.int64)
+        radices = []
+        for name in group_by:
+            radix = max(len(self.dictionaries[name]), 1)
+            keys = keys * radix + data[name]
+            radices.append((name, radix))
+
+        if bucket_seconds:
+            buckets = data['timestamp'] // int(bucket_seconds)
+            first_bucket = int(buckets.min())
+            radix = int(buckets.max()) - first_bucket + 1
+            keys = keys * radix + (buckets - first_bucket)
+            radices.append(('bucket', radix))
+
+        key_space = 1
+        for _, radix in radices:
+            key_space *= radix
+
+        if key_space <= 4 * num_rows:
+            # Dense key space: count straight into it and drop empty groups
+            counts = np.bincount(keys, minlength=key_space)
+            sums = np.bincount(keys, weights=data[metric], minlength=key_space) if metric else None
+            unique_keys = np.flatnonzero(counts)
+            counts = counts[unique_keys]
+            sums = sums[unique_keys] if metric else None
+        else:
+            # Sparse key space: compact it first so bincount stays small
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+            counts = np.bincount(inverse)
+            sums = np.bincount(inverse, weights=data[metric]) if metric else None
+
+        # Decode each unique key back into its group values
+        decoded = {}
+        remaining = unique_keys.copy()
+        for name, radix in reversed(radices):
+            decoded[name] = remaining % radix
+            remaining //= radix
+
+        results = []
+        for i in range(len(unique_keys)):
+            row = {}
+            for name in group_by:
+                row[name] = self.dictionaries[name][int(decoded[name][i])]
+            if bucket_seconds:
+                row['bucket'] = (int(decoded['bucket'][i]) + first_bucket) * int(bucket_seconds)
+            row['count'] = int(counts[i])
+            if metric:
+                row[f'{metric}_sum'] = float(sums[i])
+                row[f'{metric}_mean'] = float(sums[i] / counts[i])
+            results.append(row)
+        return results
+
+    def row_count(self):
+        """Return the total number of rows stored, sealed or buffered."""
+        with self.lock:
+            return sum(len(segment['timestamp']) for segment in self.segments.values()) + len(self.buffer['timestamp'])
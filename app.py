@@ -1,23 +1,31 @@
 import os
 import json
 import time
+import atexit
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Blueprint, request, jsonify, render_template
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from jinja2 import Environment, FileSystemLoader
-from utils import transition_state, get_kb_response, tokenize
+from utils import transition_state, get_kb_response, tokenize, correct_spelling
 from post_call_logger import PostCallLogger
+from analytics_store import ConversationAnalytics
+from admin.api import admin_bp, is_admin
+from knowledge_base.store import kb_store
+from knowledge_base.api import kb_bp
+from prefork import on_worker_start, start_worker, ensure_worker_started, warm_caches
+from config import TRUSTED_PROXIES
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+# Routes for the chat app; registered on the Flask app by create_app()
+main_bp = Blueprint('main', __name__)
 
 # Load environment variables
 GOOGLE_SHEETS_CREDENTIALS = os.environ.get('GOOGLE_SHEETS_CREDENTIALS', 'credentials.json')
 GOOGLE_SHEETS_ID = os.environ.get('GOOGLE_SHEETS_ID', '')
 
-# Initialize logger
-logger = PostCallLogger(GOOGLE_SHEETS_CREDENTIALS, GOOGLE_SHEETS_ID)
+# Per-worker resources, created by init_worker() after fork
+logger = None
+analytics = None
 
 # Initialize Jinja environment for state prompts
 jinja_env = Environment(loader=FileSystemLoader('state_prompts'))
@@ -25,12 +33,60 @@ jinja_env = Environment(loader=FileSystemLoader('state_prompts'))
 # Session storage (in production, use a database)
 sessions = {}
 
-@app.route('/')
+@on_worker_start
+def init_worker():
+    """Create the resources each worker process needs its own copy of."""
+    global logger, analytics
+    
+    # Initialize logger (holds its own Google API HTTP connection)
+    logger = PostCallLogger(GOOGLE_SHEETS_CREDENTIALS, GOOGLE_SHEETS_ID)
+    
+    # Local columnar store for conversation analytics (every turn, not just key ones)
+    analytics = ConversationAnalytics(os.environ.get('ANALYTICS_DIR', 'analytics_data'))
+    atexit.register(analytics.flush)
+
+def create_app(preload=False):
+    """
+    Create the Flask app.
+    
+    Args:
+        preload (bool): Warm and freeze shared caches for forking workers
+            instead of creating per-worker resources now. Use with
+            gunicorn's preload_app (see gunicorn.conf.py), whose post_fork
+            hook then runs the per-worker setup in each worker. Without
+            that hook, each worker runs it on its first request.
+    
+    Returns:
+        Flask: The configured app
+    """
+    app = Flask(__name__)
+    CORS(app)  # Enable CORS for all routes
+    
+    # Take the client address from X-Forwarded-For when behind trusted proxies
+    if TRUSTED_PROXIES:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+    
+    app.register_blueprint(main_bp)
+    
+    # Admin-only endpoints (on-demand profiling) and KB edit endpoints
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(kb_bp)
+    
+    # Covers servers that fork workers without running a post_fork hook
+    app.before_request(ensure_worker_started)
+    
+    if preload:
+        warm_caches([jinja_env, app.jinja_env])
+    else:
+        start_worker()
+    return app
+
+@main_bp.route('/')
 def index():
     """Render the chat interface."""
     return render_template('index.html')
 
-@app.route('/api/chat', methods=['POST'])
+@main_bp.route('/api/chat', methods=['POST'])
 def chat():
     """Handle chat messages from the user."""
     data = request.json
@@ -72,14 +128,16 @@ def chat():
     
     # Get city from context or try to extract from message
     city = session['context'].get('city')
-    if not city and ('delhi' in message.lower() or 'new delhi' in message.lower()):
+    normalized = correct_spelling(message)
+    if not city and ('delhi' in normalized or 'new delhi' in normalized):
         city = 'Delhi'
         session['context']['city'] = city
-    elif not city and 'bangalore' in message.lower():
+    elif not city and 'bangalore' in normalized:
         city = 'Bangalore'
         session['context']['city'] = city
     
     # Get response based on state
+    logged_intent = intent or next_state
     if next_state == 'faq' and city:
         # Get response from knowledge base
         kb_response = get_kb_response(city, 'faq', message)
@@ -88,6 +146,7 @@ def chat():
         else:
             template = jinja_env.get_template('fallback.j2')
             response = template.render(query=message)
+            logged_intent = 'faq_fallback'
     else:
         # Get response from state template
         template = jinja_env.get_template(f'{next_state}.j2')
@@ -100,21 +159,31 @@ def chat():
     # Update session history with bot response
     session['history'][-1]['bot'] = response
     
+    # Record every turn locally for analytics
+    duration = int(time.time() - session['start_time'])
+    analytics.log_conversation(
+        session_id=session_id,
+        user_query=message,
+        bot_response=response,
+        intent=logged_intent,
+        city=city,
+        duration=duration
+    )
+    
     # Log the conversation if it's a significant state change
     if next_state in ['booking', 'cancellation', 'goodbye']:
-        duration = int(time.time() - session['start_time'])
         logger.log_conversation(
             session_id=session_id,
             user_query=message,
             bot_response=response,
-            intent=intent or next_state,
+            intent=logged_intent,
             city=city,
             duration=duration
         )
     
     return jsonify({'response': response, 'state': next_state})
 
-@app.route('/kb', methods=['GET'])
+@main_bp.route('/kb', methods=['GET'])
 def knowledge_base():
     """Retrieve information from the knowledge base."""
     city = request.args.get('city')
@@ -123,24 +192,18 @@ def knowledge_base():
     if not city or not intent:
         return jsonify({'error': 'Missing parameters. Required: city, intent'}), 400
     
-    try:
-        # Load the appropriate knowledge base file
-        kb_file = f'kb_data/{city.lower()}_kb.json'
-        with open(kb_file, 'r') as f:
-            kb_data = json.load(f)
-        
-        # Return the relevant section
-        if intent in kb_data:
-            return jsonify({'data': kb_data[intent]})
-        else:
-            return jsonify({'error': f'Intent {intent} not found in knowledge base'}), 404
-    
-    except FileNotFoundError:
+    # Read the current in-memory snapshot (kept up to date by the /kb edit API)
+    snapshot = kb_store.snapshot(city)
+    if snapshot is None:
         return jsonify({'error': f'Knowledge base for {city} not found'}), 404
-    except json.JSONDecodeError:
-        return jsonify({'error': 'Invalid knowledge base format'}), 500
+    
+    # Return the relevant section
+    if intent in snapshot.sections:
+        return jsonify({'data': snapshot.entries(intent)})
+    else:
+        return jsonify({'error': f'Intent {intent} not found in knowledge base'}), 404
 
-@app.route('/log_call', methods=['POST'])
+@main_bp.route('/log_call', methods=['POST'])
 def log_call():
     """Log conversation data to Google Sheets."""
     data = request.json
@@ -151,6 +214,15 @@ def log_call():
         if field not in data:
             return jsonify({'error': f'Missing required field: {field}'}), 400
     
+    analytics.log_conversation(
+        session_id=data['session_id'],
+        user_query=data['user_query'],
+        bot_response=data['bot_response'],
+        intent=data['intent'],
+        city=data.get('city'),
+        duration=data.get('duration')
+    )
+    
     # Log to Google Sheets
     success = logger.log_conversation(
         session_id=data['session_id'],
@@ -166,5 +238,39 @@ def log_call():
     else:
         return jsonify({'error': 'Failed to log conversation'}), 500
 
+@main_bp.route('/analytics', methods=['GET'])
+def conversation_analytics():
+    """
+    Aggregate logged conversation turns, e.g. bookings per city per hour.
+    
+    Turns answered by other workers are included once their buffer is
+    sealed, which happens every few seconds (see ConversationAnalytics).
+    Admin only: grouping by session_id lists live session ids.
+    """
+    if not is_admin():
+        return jsonify({'error': 'Admin token required'}), 403
+    
+    group_by = [name for name in request.args.get('group_by', '').split(',') if name]
+    
+    try:
+        bucket = request.args.get('bucket', type=int)
+        since = request.args.get('since', type=int)
+        until = request.args.get('until', type=int)
+        start = time.time()
+        results = analytics.aggregate(
+            group_by=group_by,
+            bucket_seconds=bucket,
+            metric=request.args.get('metric'),
+            since=since,
+            until=until
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'data': results,
+        'query_ms': round((time.time() - start) * 1000, 2)
+    })
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
@@ -0,0 +1,86 @@
+import time
+import random
+import threading
+from chatbot.admission import AdmissionController, message_priority
+
+# Simulated Retail AI upstream: 8 requests served at a time, 100 ms each
+UPSTREAM_CAPACITY = 8
+UPSTREAM_SECONDS = 0.1
+LOCAL_SECONDS = 0.001
+
+MESSAGES = ['What are the opening hours?', 'How much is the buffet?',
+            'I want to book a table for 4', 'Cancel my reservation', 'Where are you located?']
+
+upstream = threading.Semaphore(UPSTREAM_CAPACITY)
+
+def call_upstream():
+    """Stand-in for the Retail AI request: queues once its capacity is used up."""
+    with upstream:
+        time.sleep(UPSTREAM_SECONDS)
+
+def percentile(values, pct):
+    """Return the pct-th percentile of a list of numbers."""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def run_load(controller, clients=64, seconds=5):
+    """Hammer the chat path from many threads and collect per-request latency."""
+    latencies = {'high': [], 'normal': []}
+    rejected = [0]
+    deadline = time.monotonic() + seconds
+    lock = threading.Lock()
+    
+    def client(client_id):
+        while time.monotonic() < deadline:
+            message = random.choice(MESSAGES)
+            priority = message_priority(message)
+            start = time.monotonic()
+            
+            if controller is None:
+                call_upstream()
+            elif controller.check_rate(f'session_{client_id}', f'10.0.0.{client_id % 4}') is not None:
+                with lock:
+                    rejected[0] += 1
+                time.sleep(0.01)
+                continue
+            elif controller.acquire_upstream(priority):
+                try:
+                    call_upstream()
+                finally:
+                    controller.release_upstream()
+            else:
+                # Shed: cheap local KB answer instead of queuing
+                time.sleep(LOCAL_SECONDS)
+            
+            with lock:
+                latencies[priority].append(time.monotonic() - start)
+    
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, rejected[0]
+
+def report(name, latencies, rejected):
+    """Print latency percentiles per priority class."""
+    print(name)
+    for priority, values in latencies.items():
+        if values:
+            print(f"  {priority:6s}: {len(values):5d} requests, p50 {percentile(values, 50) * 1000:7.1f} ms, "
+                  f"p99 {percentile(values, 99) * 1000:7.1f} ms")
+    print(f"  rate limited (429): {rejected}")
+
+if __name__ == "__main__":
+    report('Without admission control', *run_load(None))
+    
+    # Rate limits effectively off: only the upstream cap and priority shedding apply
+    controller = AdmissionController(session_rate=1e6, session_burst=1e6, ip_rate=1e6, ip_burst=1e6,
+                                     max_upstream=UPSTREAM_CAPACITY, reserved_high=2)
+    report('With upstream cap and shedding', *run_load(controller))
+    print(f"  stats: {controller.stats()}")
+    
+    # Default per-session and per-IP limits from config.py on top
+    controller = AdmissionController(max_upstream=UPSTREAM_CAPACITY, reserved_high=2)
+    report('With default rate limits as well', *run_load(controller))
+    print(f"  stats: {controller.stats()}")
@@ -0,0 +1,49 @@
+import time
+import tempfile
+import numpy as np
+from analytics_store import ConversationAnalytics
+
+def bench_analytics(num_rows=2_000_000):
+    """Load synthetic turns into the analytics store and time common queries."""
+    rng = np.random.default_rng(42)
+    now = int(time.time())
+    
+    columns = {
+        'timestamp': now - rng.integers(0, 30 * 86400, num_rows),
+        'session_id': [f'session_{i}' for i in rng.integers(0, 50_000, num_rows)],
+        'intent': rng.choice(['booking', 'cancellation', 'faq', 'faq_fallback', 'goodbye', 'fallback'], num_rows),
+        'city': rng.choice(['Delhi', 'Bangalore', 'N/A'], num_rows),
+        'duration': rng.integers(0, 600, num_rows),
+        'query_len': rng.integers(1, 200, num_rows),
+        'response_len': rng.integers(20, 400, num_rows)
+    }
+    
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = ConversationAnalytics(data_dir)
+        
+        start = time.time()
+        store.bulk_load(columns)
+        print(f"Loaded {store.row_count()} rows in {time.time() - start:.2f}s")
+        
+        queries = {
+            'bookings per city per hour': dict(group_by=['city', 'intent'], bucket_seconds=3600),
+            'turns per intent': dict(group_by=['intent']),
+            'mean duration per city': dict(group_by=['city'], metric='duration'),
+            'last 24h per intent': dict(group_by=['intent'], since=now - 86400),
+            'turns per session': dict(group_by=['session_id'])
+        }
+        
+        for name, kwargs in queries.items():
+            timings = []
+            for _ in range(5):
+                start = time.time()
+                results = store.aggregate(**kwargs)
+                timings.append(time.time() - start)
+            print(f"{name}: {len(results)} groups, best {min(timings) * 1000:.1f} ms")
+        
+        counts = {row['intent']: row['count'] for row in store.aggregate(group_by=['intent'])}
+        faq_total = counts.get('faq', 0) + counts.get('faq_fallback', 0)
+        print(f"FAQ fallback rate: {counts.get('faq_fallback', 0) / faq_total:.1%}")
+
+if __name__ == "__main__":
+    bench_analytics()
@@ -0,0 +1,94 @@
+import io
+import os
+import sys
+import json
+import time
+import subprocess
+from contextlib import redirect_stdout
+
+WORKERS = 4
+
+def memory_kb():
+    """Return this process's RSS and private (unshared) memory in kB."""
+    stats = {}
+    with open('/proc/self/smaps_rollup', 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                stats[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': stats.get('Rss', 0),
+        'private': stats.get('Private_Clean', 0) + stats.get('Private_Dirty', 0)
+    }
+
+def first_requests(app):
+    """Time the first and second round of typical requests in a fresh worker."""
+    client = app.test_client()
+    timings = []
+    for round_number in range(2):
+        start = time.perf_counter()
+        client.post('/api/chat', json={'message': '', 'session_id': f'bench_{round_number}'})
+        client.get('/kb?city=delhi&intent=faq')
+        client.get('/kb/?city=bangalore&intent=booking')
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def run_worker(write_fd, preloaded_app):
+    """Body of one forked worker: set up, serve the first requests, report."""
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if preloaded_app is None:
+            from app import create_app
+            app = create_app()
+        else:
+            from prefork import start_worker
+            start_worker()
+            app = preloaded_app
+        startup_ms = (time.perf_counter() - start) * 1000
+        first_ms, second_ms = first_requests(app)
+    
+    result = dict(memory_kb(), startup_ms=startup_ms, first_ms=first_ms, second_ms=second_ms)
+    os.write(write_fd, (json.dumps(result) + '\n').encode())
+    os._exit(0)
+
+def run_mode(mode):
+    """Fork WORKERS workers, with or without preloading in the master, and print their stats."""
+    preloaded_app = None
+    if mode == 'preload':
+        with redirect_stdout(io.StringIO()):
+            from app import create_app
+            preloaded_app = create_app(preload=True)
+    
+    read_fd, write_fd = os.pipe()
+    children = []
+    for _ in range(WORKERS):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            run_worker(write_fd, preloaded_app)
+        children.append(pid)
+        # Stagger workers so each measurement sees the others alive and idle
+        time.sleep(0.5)
+    
+    os.close(write_fd)
+    for pid in children:
+        os.waitpid(pid, 0)
+    with os.fdopen(read_fd) as f:
+        print(f.read(), end='')
+
+def main():
+    """Run both modes in clean interpreters and print a comparison table."""
+    print(f"{'mode':8s} {'worker':>6s} {'RSS MB':>8s} {'private MB':>11s} {'setup ms':>9s} "
+          f"{'1st req ms':>11s} {'2nd req ms':>11s}")
+    for mode in ['cold', 'preload']:
+        output = subprocess.run([sys.executable, __file__, mode], capture_output=True, text=True).stdout
+        for i, line in enumerate(output.splitlines()):
+            result = json.loads(line)
+            print(f"{mode:8s} {i:6d} {result['rss'] / 1024:8.1f} {result['private'] / 1024:11.1f} "
+                  f"{result['startup_ms']:9.1f} {result['first_ms']:11.1f} {result['second_ms']:11.1f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run_mode(sys.argv[1])
+    else:
+        main()
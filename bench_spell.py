@@ -0,0 +1,67 @@
+import time
+from spell_index import shared_index, correct_spelling, edit_distance
+
+# Misspelt token -> expected correction
+TYPOS = {
+    'resevation': 'reservation', 'reservaton': 'reservation', 'resevration': 'reservation',
+    'buffett': 'buffet', 'bufet': 'buffet', 'banglore': 'bangalore', 'bangalor': 'bangalore',
+    'bengalore': 'bangalore', 'dehli': 'delhi', 'delih': 'delhi', 'cancle': 'cancel',
+    'cancell': 'cancel', 'reschdule': 'reschedule', 'locaton': 'location', 'adress': 'address',
+    'addres': 'address', 'prise': 'price', 'vegitarian': 'vegetarian', 'tommorow': 'tomorrow',
+    'tomorow': 'tomorrow', 'todya': 'today', 'confrim': 'confirm', 'peopel': 'people',
+    'guets': 'guests', 'dinnr': 'dinner', 'lunchh': 'lunch', 'goodbey': 'goodbye',
+    'thnaks': 'thanks', 'ofers': 'offers', 'discont': 'discount', 'senoir': 'senior',
+    'birthay': 'birthday', 'childern': 'children', 'weekdys': 'weekdays'
+}
+
+# Short words that must come back unchanged
+KEEP = ['and', 'then', 'want', 'what', 'table', 'please', 'for', 'the', 'some', 'friends']
+
+# Real words one or two edits from a keyword that must not be "corrected" into it
+FALSE_POSITIVES = [
+    'sent', 'parking', 'food', 'come', 'name', 'weekend', 'weekends', 'times', 'police',
+    'changes', 'tables', 'confirmed', 'reserved', 'taking', 'living', 'played', 'eyes',
+    'hell', 'cancer', 'reasons', 'prices', 'coast', 'channel', 'budget', 'winner', 'thinks',
+    'ends', 'suit', 'launch', 'feed', 'schedule', 'unable', 'tank', 'stable', 'locked',
+    'hook', 'edit', 'neat', 'oven', 'tide', 'sour', 'circle', 'making', 'good', 'same'
+]
+
+def brute_force(vocabulary, token, max_distance=2):
+    """Correct a token by computing edit distance to every correction target."""
+    if shared_index.is_word(token):
+        return token
+    best = min(vocabulary, key=lambda word: (edit_distance(token, word, max_distance), word))
+    return best if edit_distance(token, best, max_distance) <= max_distance else token
+
+def bench_spell(repeats=2000):
+    """Compare the deletion index with pairwise edit distance on latency and accuracy."""
+    # Adds the knowledge base vocabulary to the keyword and city targets
+    correct_spelling('')
+    print(f"Shared index: {len(shared_index.targets)} targets ({len(shared_index.deletes)} deletes), "
+          f"{len(shared_index.known_words)} known words")
+
+    correct = sum(1 for typo, expected in TYPOS.items() if shared_index.lookup(typo) == expected)
+    kept = sum(1 for word in KEEP + FALSE_POSITIVES if shared_index.lookup(word) == word)
+    print(f"Accuracy: {correct}/{len(TYPOS)} typos corrected, "
+          f"{kept}/{len(KEEP) + len(FALSE_POSITIVES)} correct words kept")
+    for typo, expected in TYPOS.items():
+        if shared_index.lookup(typo) != expected:
+            print(f"  miss: {typo} -> {shared_index.lookup(typo)} (expected {expected})")
+    for word in KEEP + FALSE_POSITIVES:
+        if shared_index.lookup(word) != word:
+            print(f"  false positive: {word} -> {shared_index.lookup(word)}")
+
+    tokens = list(TYPOS) + KEEP + FALSE_POSITIVES
+    targets = sorted(shared_index.targets)
+    for name, lookup in [('deletion index', shared_index.lookup),
+                         ('pairwise', lambda token: brute_force(targets, token))]:
+        rounds = repeats if name == 'deletion index' else repeats // 20
+        start = time.time()
+        for _ in range(rounds):
+            for token in tokens:
+                lookup(token)
+        elapsed = time.time() - start
+        print(f"{name}: {elapsed / (rounds * len(tokens)) * 1e6:.1f} us per token")
+
+if __name__ == "__main__":
+    bench_spell()
@@ -0,0 +1,184 @@
+import time
+import threading
+from collections import Counter
+
+# Messages mentioning these go ahead of general questions for upstream slots
+HIGH_PRIORITY_KEYWORDS = ['book', 'reserv', 'cancel', 'reschedule', 'table']
+
+def message_priority(message):
+    """
+    Classify a chat message for load shedding.
+
+    Args:
+        message (str): User's message
+
+    Returns:
+        str: 'high' for booking and cancellation requests, 'normal' otherwise
+    """
+    message = message.lower()
+    return 'high' if any(keyword in message for keyword in HIGH_PRIORITY_KEYWORDS) else 'normal'
+
+class TokenBucketLimiter:
+    def __init__(self, rate, burst, max_keys=100000):
+        """
+        Initialize a per-key token bucket rate limiter.
+
+        Each key (a session id or client IP) gets a bucket of `burst` tokens
+        refilled at `rate` tokens per second; every request spends one.
+
+        Args:
+            rate (float): Tokens added per second
+            burst (int): Bucket capacity
+            max_keys (int): Number of buckets kept before idle ones are pruned
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def allow(self, key, now=None):
+        """
+        Spend one token for a key if available.
+
+        Args:
+            key (str): Bucket key
+            now (float, optional): Current monotonic time, for testing
+
+        Returns:
+            tuple: (allowed, retry_after) where retry_after is the number of
+                seconds until a token is available (0 when allowed)
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            retry_after = self._wait_time(key, now)
+            if retry_after == 0:
+                self._spend(key, now)
+        return retry_after == 0, retry_after
+
+    def _wait_time(self, key, now):
+        """Return seconds until a token is available for a key (0 if one is). Caller holds the lock."""
+        tokens, last = self.buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def _spend(self, key, now):
+        """Take one token for a key that has one available. Caller holds the lock."""
+        tokens, last = self.buckets.get(key, (self.burst, now))
+        self.buckets[key] = (min(self.burst, tokens + (now - last) * self.rate) - 1, now)
+        if len(self.buckets) > self.max_keys:
+            self._prune(now)
+
+    def _prune(self, now):
+        """Drop buckets that have refilled completely; they behave like new keys."""
+        full_after = self.burst / self.rate
+        self.buckets = {key: bucket for key, bucket in self.buckets.items()
+                        if now - bucket[1] < full_after}
+
+class AdmissionController:
+    def __init__(self, session_rate=1.0, session_burst=5, ip_rate=5.0, ip_burst=20,
+                 max_upstream=16, reserved_high=4):
+        """
+        Initialize admission control for the chat endpoint.
+
+        Requests are first rate limited per session and per client IP. Those
+        admitted then need an upstream slot before calling the Retail AI API;
+        `reserved_high` of the `max_upstream` slots are kept for high-priority
+        messages. Nothing waits: a request that cannot get a slot is shed at once.
+
+        Args:
+            session_rate (float): Requests per second allowed per session
+            session_burst (int): Burst size per session
+            ip_rate (float): Requests per second allowed per client IP
+            ip_burst (int): Burst size per client IP
+            max_upstream (int): Maximum concurrent upstream KB calls
+            reserved_high (int): Upstream slots only high-priority messages may use
+        """
+        self.session_limiter = TokenBucketLimiter(session_rate, session_burst)
+        self.ip_limiter = TokenBucketLimiter(ip_rate, ip_burst)
+        self.max_upstream = max_upstream
+        self.reserved_high = min(reserved_high, max_upstream)
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.counters = Counter()
+
+    def check_rate(self, session_id, client_ip):
+        """
+        Apply the per-session and per-IP rate limits.
+
+        A token is only spent when both limits allow the request, so a
+        rejected session does not use up its IP's budget or the reverse.
+        Requests without a session id are limited by IP only, rather than
+        all sharing one bucket.
+
+        Args:
+            session_id (str): Chat session id (may be empty)
+            client_ip (str): Client IP address
+
+        Returns:
+            float: Seconds the client should wait before retrying, or None if admitted
+        """
+        checks = [('ip', self.ip_limiter, client_ip or 'unknown')]
+        if session_id:
+            checks.append(('session', self.session_limiter, session_id))
+        now = time.monotonic()
+        # Always taken in this order, so two requests cannot deadlock
+        with self.ip_limiter.lock, self.session_limiter.lock:
+            waits = [(name, limiter._wait_time(key, now)) for name, limiter, key in checks]
+            denied = [(name, wait) for name, wait in waits if wait > 0]
+            if not denied:
+                for _, limiter, key in checks:
+                    limiter._spend(key, now)
+
+        if denied:
+            # Counted against the first limit that failed; wait for the slower one
+            self._count(f'rate_limited_{denied[0][0]}')
+            return max(wait for _, wait in denied)
+        self._count('admitted')
+        return None
+
+    def acquire_upstream(self, priority='normal'):
+        """
+        Try to take an upstream slot without waiting.
+
+        Args:
+            priority (str): 'high' or 'normal'
+
+        Returns:
+            bool: True if a slot was taken (call release_upstream afterwards),
+                False if the request should be shed
+        """
+        limit = self.max_upstream if priority == 'high' else self.max_upstream - self.reserved_high
+        with self.lock:
+            if self.in_flight < limit:
+                self.in_flight += 1
+                self.counters[f'upstream_{priority}'] += 1
+                return True
+            self.counters[f'shed_{priority}'] += 1
+            return False
+
+    def release_upstream(self):
+        """Return an upstream slot taken by acquire_upstream."""
+        with self.lock:
+            self.in_flight -= 1
+
+    def _count(self, name):
+        """Increment a stats counter."""
+        with self.lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        """
+        Return admission counters and current upstream usage.
+
+        Returns:
+            dict: Counts of admitted and rate-limited requests, upstream calls
+                and shed requests per priority, plus in-flight upstream calls
+                and the configured limits
+        """
+        with self.lock:
+            stats = dict(self.counters)
+            stats['in_flight'] = self.in_flight
+        stats['max_upstream'] = self.max_upstream
+        stats['reserved_high'] = self.reserved_high
+        return stats
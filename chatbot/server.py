@@ -3,7 +3,11 @@ import os
 import json
 import time
 from datetime import datetime
-from config import KNOWLEDGE_BASE_KEY, AGENT_KEY
+from config import (KNOWLEDGE_BASE_KEY, AGENT_KEY, CHAT_SESSION_RATE, CHAT_SESSION_BURST,
+                    CHAT_IP_RATE, CHAT_IP_BURST, UPSTREAM_MAX_PER_WORKER,
+                    UPSTREAM_RESERVED_HIGH_PER_WORKER)
+from chatbot.admission import AdmissionController, message_priority
+from admin.api import is_admin
 
 # Create the blueprint
 chatbot_bp = Blueprint('chatbot', __name__, url_prefix='/api')
@@ -11,6 +15,17 @@ chatbot_bp = Blueprint('chatbot', __name__, url_prefix='/api')
 # Session storage (in production, use a database)
 sessions = {}
 
+# Rate limits and upstream concurrency cap, applied before any work is done.
+# Both are per worker process; the upstream cap is this worker's share.
+admission = AdmissionController(
+    session_rate=CHAT_SESSION_RATE,
+    session_burst=CHAT_SESSION_BURST,
+    ip_rate=CHAT_IP_RATE,
+    ip_burst=CHAT_IP_BURST,
+    max_upstream=UPSTREAM_MAX_PER_WORKER,
+    reserved_high=UPSTREAM_RESERVED_HIGH_PER_WORKER
+)
+
 @chatbot_bp.route('/chat', methods=['POST'])
 def chat():
     """Handle chat messages from the user."""
@@ -18,6 +33,14 @@ def chat():
     message = data.get('message', '')
     session_id = data.get('session_id', '')
     
+    # Reject floods before they create sessions or reach the upstream API.
+    # remote_addr is the real client when TRUSTED_PROXIES is set (see create_app)
+    retry_after = admission.check_rate(session_id, request.remote_addr)
+    if retry_after is not None:
+        response = jsonify({'error': 'Too many requests. Please slow down.', 'retry_after': round(retry_after, 2)})
+        response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+        return response, 429
+    
     # Initialize session if it doesn't exist
     if session_id not in sessions:
         sessions[session_id] = {
@@ -46,11 +69,18 @@ def chat():
         'timestamp': datetime.now().isoformat()
     })
     
-    # Import the knowledge base response function
-    from knowledge_base.data import get_knowledge_base_response
+    # Import the knowledge base response functions
+    from knowledge_base.data import get_knowledge_base_response, get_local_kb_response
     
-    # Try to get a response from the knowledge base using environment variables
-    kb_response = get_knowledge_base_response(message, KNOWLEDGE_BASE_KEY, AGENT_KEY)
+    # Only call the upstream KB if a slot is free; otherwise answer locally right away
+    if admission.acquire_upstream(message_priority(message)):
+        try:
+            # Try to get a response from the knowledge base using environment variables
+            kb_response = get_knowledge_base_response(message, KNOWLEDGE_BASE_KEY, AGENT_KEY)
+        finally:
+            admission.release_upstream()
+    else:
+        kb_response = get_local_kb_response(message)
     
     if kb_response:
         response = kb_response
@@ -61,4 +91,11 @@ def chat():
     # Update session history with bot response
     session['history'][-1]['bot'] = response
     
-    return jsonify({'response': response, 'state': 'response'})
\ No newline at end of file
+    return jsonify({'response': response, 'state': 'response'})
+
+@chatbot_bp.route('/admission', methods=['GET'])
+def admission_stats():
+    """Report admitted, shed and rate-limited chat requests."""
+    if not is_admin():
+        return jsonify({'error': 'Admin token required'}), 403
+    return jsonify(admission.stats())
@@ -4,6 +4,30 @@ import os
 KNOWLEDGE_BASE_KEY = os.environ.get('KNOWLEDGE_BASE_KEY')
 AGENT_KEY = os.environ.get('AGENT_KEY')
 
+# Token required by the /admin endpoints; they are disabled when unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Number of reverse proxies / load balancers in front of the app whose
+# X-Forwarded-For header is trusted; 0 uses the socket peer address
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+
+# Worker processes serving the app (gunicorn.conf.py reads the same variable)
+WEB_CONCURRENCY = max(1, int(os.environ.get('WEB_CONCURRENCY', 1)))
+
+# Admission control for /api/chat. The rate limits are enforced by each worker
+# process separately, so with N workers a client may get up to N times the rate.
+CHAT_SESSION_RATE = float(os.environ.get('CHAT_SESSION_RATE', 1.0))
+CHAT_SESSION_BURST = int(os.environ.get('CHAT_SESSION_BURST', 5))
+CHAT_IP_RATE = float(os.environ.get('CHAT_IP_RATE', 5.0))
+CHAT_IP_BURST = int(os.environ.get('CHAT_IP_BURST', 20))
+UPSTREAM_MAX_CONCURRENT = int(os.environ.get('UPSTREAM_MAX_CONCURRENT', 16))
+UPSTREAM_RESERVED_HIGH = int(os.environ.get('UPSTREAM_RESERVED_HIGH', 4))
+
+# The upstream cap is for the whole deployment; each worker enforces its share
+UPSTREAM_MAX_PER_WORKER = max(1, UPSTREAM_MAX_CONCURRENT // WEB_CONCURRENCY)
+UPSTREAM_RESERVED_HIGH_PER_WORKER = (min(UPSTREAM_MAX_PER_WORKER - 1, max(1, UPSTREAM_RESERVED_HIGH // WEB_CONCURRENCY))
+                                     if UPSTREAM_RESERVED_HIGH else 0)
+
 # Validate that keys are available
 if not KNOWLEDGE_BASE_KEY or not AGENT_KEY:
     print("Warning: API keys not found in environment variables.")
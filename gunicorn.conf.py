@@ -0,0 +1,24 @@
+# Gunicorn settings for pre-fork serving with shared, warmed caches.
+#
+#   gunicorn -c gunicorn.conf.py                                  # app.py
+#   gunicorn -c gunicorn.conf.py 'server:create_app(preload=True)'  # server.py
+import os
+import prefork
+
+wsgi_app = 'app:create_app(preload=True)'
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+# Exported so config.py can split the upstream cap between the workers
+os.environ.setdefault('WEB_CONCURRENCY', '4')
+workers = int(os.environ['WEB_CONCURRENCY'])
+
+# Threaded workers: /admin/profile samples the other requests running in
+# its worker, which a single-threaded sync worker would never have
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Load the app (and warm its caches) once in the master, then fork workers
+preload_app = True
+
+def post_fork(server, worker):
+    """Create per-worker resources (HTTP clients, loggers, threads) in each new worker."""
+    prefork.start_worker()
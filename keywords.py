@@ -0,0 +1,20 @@
+# Keywords for intent detection, shared by the chat flows and the spelling index
+BOOKING_KEYWORDS = ['book', 'reservation', 'reserve', 'table', 'seat', 'dinner', 'lunch']
+CANCEL_KEYWORDS = ['cancel', 'reschedule', 'change reservation']
+FAQ_KEYWORDS = ['hour', 'open', 'menu', 'price', 'cost', 'location', 'address', 'buffet', 'veg', 'non-veg']
+GOODBYE_KEYWORDS = ['bye', 'goodbye', 'thank', 'thanks', 'exit', 'quit', 'end']
+
+# Words the booking flow looks for once a booking has started
+BOOKING_FLOW_WORDS = ['today', 'tomorrow', 'yes', 'confirm', 'people', 'persons', 'guests']
+
+# Words the local knowledge base fallback matches on
+LOCAL_KB_KEYWORDS = [
+    'hour', 'open', 'time', 'timing', 'when', 'price', 'cost', 'buffet', 'menu',
+    'charge', 'fee', 'expensive', 'location', 'address', 'where', 'place', 'situated',
+    'located', 'veg', 'vegetarian', 'plant', 'book', 'reservation', 'table', 'reserve',
+    'seat', 'hello', 'hey', 'greetings'
+]
+
+# Every keyword above; misspellings of these are corrected into them
+ALL_KEYWORDS = (BOOKING_KEYWORDS + CANCEL_KEYWORDS + FAQ_KEYWORDS + GOODBYE_KEYWORDS +
+                BOOKING_FLOW_WORDS + LOCAL_KB_KEYWORDS)
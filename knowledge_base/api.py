@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
-import json
+import time
+from admin.api import is_admin
+from knowledge_base.store import kb_store, REQUIRED_FIELDS
 
 # Create the blueprint
 kb_bp = Blueprint('knowledge_base', __name__, url_prefix='/kb')
@@ -13,19 +15,84 @@ def get_knowledge():
     if not city or not intent:
         return jsonify({'error': 'Missing parameters. Required: city, intent'}), 400
     
-    try:
-        # Load the appropriate knowledge base file
-        kb_file = f'kb_data/{city.lower()}_kb.json'
-        with open(kb_file, 'r') as f:
-            kb_data = json.load(f)
-        
-        # Return the relevant section
-        if intent in kb_data:
-            return jsonify({'data': kb_data[intent]})
-        else:
-            return jsonify({'error': f'Intent {intent} not found in knowledge base'}), 404
+    # Read the current snapshot; edits show up at once in the worker that made
+    # them and within the store's refresh interval in the others
+    snapshot = kb_store.snapshot(city)
+    if snapshot is None:
+        return jsonify({'error': f'Knowledge base for {city} not found'}), 404
     
-    except FileNotFoundError:
+    # Return the relevant section
+    if intent in snapshot.sections:
+        return jsonify({'data': snapshot.entries(intent)})
+    else:
+        return jsonify({'error': f'Intent {intent} not found in knowledge base'}), 404
+
+def check_edit_request(city, section):
+    """Return an error response for an unauthorised or invalid edit, or None."""
+    if not is_admin():
+        return jsonify({'error': 'Admin token required'}), 403
+    if section not in REQUIRED_FIELDS:
+        return jsonify({'error': f'Unknown section: {section}'}), 404
+    if kb_store.snapshot(city) is None:
         return jsonify({'error': f'Knowledge base for {city} not found'}), 404
-    except json.JSONDecodeError:
-        return jsonify({'error': 'Invalid knowledge base format'}), 500
\ No newline at end of file
+    if request.method != 'DELETE' and not isinstance(request.json, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    return None
+
+def edit_response(snapshot, start, entry=None, status=200):
+    """Build the JSON response for a successful edit, including how long it took to apply."""
+    body = {
+        'success': True,
+        'version': snapshot.version,
+        'apply_ms': round((time.perf_counter() - start) * 1000, 3)
+    }
+    if entry is not None:
+        body['entry'] = entry
+    return jsonify(body), status
+
+@kb_bp.route('/<city>/<section>', methods=['POST'])
+def add_entry(city, section):
+    """Add a FAQ or booking entry to a city's knowledge base."""
+    error = check_edit_request(city, section)
+    if error:
+        return error
+    
+    start = time.perf_counter()
+    try:
+        entry, snapshot = kb_store.add_entry(city, section, request.json)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except OSError as e:
+        print(f"Error assigning an entry id for {city}: {e}")
+        return jsonify({'error': 'Could not save knowledge base'}), 500
+    return edit_response(snapshot, start, entry, 201)
+
+@kb_bp.route('/<city>/<section>/<int:entry_id>', methods=['PUT', 'PATCH'])
+def update_entry(city, section, entry_id):
+    """Update fields of a single knowledge base entry."""
+    error = check_edit_request(city, section)
+    if error:
+        return error
+    
+    start = time.perf_counter()
+    try:
+        entry, snapshot = kb_store.update_entry(city, section, entry_id, request.json)
+    except KeyError:
+        return jsonify({'error': f'Entry {entry_id} not found in {section}'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return edit_response(snapshot, start, entry)
+
+@kb_bp.route('/<city>/<section>/<int:entry_id>', methods=['DELETE'])
+def delete_entry(city, section, entry_id):
+    """Delete a single knowledge base entry."""
+    error = check_edit_request(city, section)
+    if error:
+        return error
+    
+    start = time.perf_counter()
+    try:
+        snapshot = kb_store.delete_entry(city, section, entry_id)
+    except KeyError:
+        return jsonify({'error': f'Entry {entry_id} not found in {section}'}), 404
+    return edit_response(snapshot, start)
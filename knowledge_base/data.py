@@ -1,7 +1,25 @@
 import requests
-import json
 import os
 import random
+from spell_index import correct_spelling
+from knowledge_base.store import kb_store
+
+# One HTTP session per process so connections to the Retail AI API are reused
+http_session = None
+
+def get_http_session():
+    """Return this process's HTTP session, creating it on first use."""
+    global http_session
+    if http_session is None:
+        http_session = requests.Session()
+    return http_session
+
+def reset_http_session():
+    """Drop a session inherited across fork; its sockets belong to the parent."""
+    global http_session
+    http_session = None
+
+os.register_at_fork(after_in_child=reset_http_session)
 
 def get_knowledge_base_response(query, kb_key, agent_key):
     """
@@ -35,10 +53,10 @@ def get_knowledge_base_response(query, kb_key, agent_key):
         try:
             # Make the API call to the knowledge base endpoint
             print("Attempting to call external API...")
-            response = requests.post('https://api.retailai.com/v1/knowledge/query', 
-                                    headers=headers, 
-                                    json=payload,
-                                    timeout=5)  # Add timeout
+            response = get_http_session().post('https://api.retailai.com/v1/knowledge/query', 
+                                                headers=headers, 
+                                                json=payload,
+                                                timeout=5)  # Add timeout
             
             print(f"API response status: {response.status_code}")
             
@@ -53,124 +71,116 @@ def get_knowledge_base_response(query, kb_key, agent_key):
         
         # Fallback to local knowledge base if API call fails
         print("Falling back to local knowledge base")
-        query = query.lower()
-        
-        # Load local knowledge base for testing
-        try:
-            kb_data = None
-            if 'delhi' in query:
-                print("Loading Delhi knowledge base")
-                kb_file = 'kb_data/delhi_kb.json'
-            else:
-                print("Loading Bangalore knowledge base")
-                kb_file = 'kb_data/bangalore_kb.json'
-            
-            # Check if file exists
-            if os.path.exists(kb_file):
-                with open(kb_file, 'r') as f:
-                    kb_data = json.load(f)
-            else:
-                print(f"Knowledge base file not found: {kb_file}")
-                # Provide default responses if KB files don't exist
-                default_responses = {
-                    'hours': "Barbeque Nation is open from 12 PM to 3:30 PM for lunch and 6:30 PM to 11 PM for dinner, seven days a week.",
-                    'price': "The buffet at Barbeque Nation costs approximately ₹800 to ₹1200 per person, depending on the day and time.",
-                    'location': "Barbeque Nation has multiple locations across major cities in India. Please specify which city you're interested in.",
-                    'vegetarian': "Yes, Barbeque Nation offers a wide range of vegetarian options including grilled vegetables, paneer dishes, and vegetarian curries.",
-                    'booking': "You can book a table at Barbeque Nation through our website, mobile app, or by calling the restaurant directly."
-                }
-                
-                if any(word in query for word in ['hour', 'open', 'time']):
-                    return default_responses['hours']
-                elif any(word in query for word in ['price', 'cost', 'buffet']):
-                    return default_responses['price']
-                elif any(word in query for word in ['location', 'address', 'where']):
-                    return default_responses['location']
-                elif any(word in query for word in ['veg', 'vegetarian']):
-                    return default_responses['vegetarian']
-                elif any(word in query for word in ['book', 'reservation', 'table']):
-                    return default_responses['booking']
-                return None
-                    
-            # Simple keyword matching with improved detection
-            answer = None
-            
-            # Check for hours/timing related queries
-            if any(word in query for word in ['hour', 'open', 'time', 'timing', 'when']):
-                answer = next((item['answer'] for item in kb_data.get('faq', []) 
-                           if 'opening hours' in item['question'].lower() or 'timing' in item['question'].lower()), None)
-            
-            # Check for price related queries
-            elif any(word in query for word in ['price', 'cost', 'buffet', 'menu', 'charge', 'fee', 'expensive']):
-                answer = next((item['answer'] for item in kb_data.get('faq', []) 
-                           if 'price' in item['question'].lower() or 'cost' in item['question'].lower()), None)
-            
-            # Check for location related queries
-            elif any(word in query for word in ['location', 'address', 'where', 'place', 'situated', 'located']):
-                answer = next((item['answer'] for item in kb_data.get('faq', []) 
-                           if 'located' in item['question'].lower() or 'address' in item['question'].lower()), None)
-            
-            # Check for vegetarian related queries
-            elif any(word in query for word in ['veg', 'vegetarian', 'plant', 'non-meat']):
-                answer = next((item['answer'] for item in kb_data.get('faq', []) 
-                           if 'vegetarian' in item['question'].lower()), None)
-            
-            # Check for booking related queries
-            elif any(word in query for word in ['book', 'reservation', 'table', 'reserve', 'seat']):
-                booking_info = next((item for item in kb_data.get('booking', []) 
-                                if 'Booking Information' in item.get('info', '')), None)
-                if booking_info:
-                    answer = booking_info.get('details')
-            
-            # General greeting or hello
-            elif any(word in query for word in ['hello', 'hi', 'hey', 'greetings']):
-                greetings = [
-                    "Hello! Welcome to Barbeque Nation. How can I assist you today?",
-                    "Hi there! I'm your Barbeque Nation assistant. What information do you need?",
-                    "Greetings! I'm here to help with all your Barbeque Nation queries."
-                ]
-                answer = random.choice(greetings)
-            
-            # If no specific match, try to find any relevant FAQ
-            if not answer and 'faq' in kb_data:
-                # Convert query to a set of words for better matching
-                query_words = set(query.split())
-                
-                # Find FAQs with the most word matches
-                best_match = None
-                best_match_count = 0
-                
-                for item in kb_data['faq']:
-                    question = item['question'].lower()
-                    question_words = set(question.split())
-                    match_count = len(query_words.intersection(question_words))
-                    
-                    if match_count > best_match_count:
-                        best_match_count = match_count
-                        best_match = item
-                
-                if best_match and best_match_count >= 1:
-                    answer = best_match['answer']
-            
-            if answer:
-                print(f"Found answer in local KB: {answer[:50]}...")
-            else:
-                print("No answer found in local KB")
-                # Provide a fallback response
-                fallback_responses = [
-                    "I'm not sure I understand. Could you please rephrase your question?",
-                    "I don't have specific information about that. Would you like to know about our menu, locations, or make a reservation?",
-                    "I'm sorry, I don't have that information right now. Is there something else I can help you with?"
-                ]
-                answer = random.choice(fallback_responses)
-            
-            return answer
-            
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            print(f"Error accessing local KB: {e}")
-            # Provide a fallback response for file errors
-            return "I'm having trouble accessing my knowledge base. Please try asking about our menu, locations, or making a reservation."
+        return get_local_kb_response(query)
             
     except Exception as e:
         print(f"Error querying knowledge base: {e}")
         return "I apologize, but I'm experiencing technical difficulties. Please try again later."
+
+def get_local_kb_response(query):
+    """
+    Answer a query from the local knowledge base without calling the Retail AI API.
+    
+    Used as the fallback when the API call fails, and directly when a chat
+    request is shed before reaching the API.
+    
+    Args:
+        query (str): User query
+        
+    Returns:
+        str: Response from the local knowledge base, or a canned fallback
+    """
+    query = correct_spelling(query)
+    
+    # Load local knowledge base for testing
+    if 'delhi' in query:
+        print("Loading Delhi knowledge base")
+        city = 'delhi'
+    else:
+        print("Loading Bangalore knowledge base")
+        city = 'bangalore'
+    
+    # Read the current in-memory snapshot rather than the file
+    snapshot = kb_store.snapshot(city)
+    if snapshot is None:
+        print(f"Knowledge base not found for city: {city}")
+        # Provide default responses if KB files don't exist
+        default_responses = {
+            'hours': "Barbeque Nation is open from 12 PM to 3:30 PM for lunch and 6:30 PM to 11 PM for dinner, seven days a week.",
+            'price': "The buffet at Barbeque Nation costs approximately ₹800 to ₹1200 per person, depending on the day and time.",
+            'location': "Barbeque Nation has multiple locations across major cities in India. Please specify which city you're interested in.",
+            'vegetarian': "Yes, Barbeque Nation offers a wide range of vegetarian options including grilled vegetables, paneer dishes, and vegetarian curries.",
+            'booking': "You can book a table at Barbeque Nation through our website, mobile app, or by calling the restaurant directly."
+        }
+        
+        if any(word in query for word in ['hour', 'open', 'time']):
+            return default_responses['hours']
+        elif any(word in query for word in ['price', 'cost', 'buffet']):
+            return default_responses['price']
+        elif any(word in query for word in ['location', 'address', 'where']):
+            return default_responses['location']
+        elif any(word in query for word in ['veg', 'vegetarian']):
+            return default_responses['vegetarian']
+        elif any(word in query for word in ['book', 'reservation', 'table']):
+            return default_responses['booking']
+        return None
+            
+    # Simple keyword matching with improved detection
+    answer = None
+    faqs = snapshot.entries('faq')
+    
+    # Check for hours/timing related queries
+    if any(word in query for word in ['hour', 'open', 'time', 'timing', 'when']):
+        answer = next((item['answer'] for item in faqs 
+                   if 'opening hours' in item['question'].lower() or 'timing' in item['question'].lower()), None)
+    
+    # Check for price related queries
+    elif any(word in query for word in ['price', 'cost', 'buffet', 'menu', 'charge', 'fee', 'expensive']):
+        answer = next((item['answer'] for item in faqs 
+                   if 'price' in item['question'].lower() or 'cost' in item['question'].lower()), None)
+    
+    # Check for location related queries
+    elif any(word in query for word in ['location', 'address', 'where', 'place', 'situated', 'located']):
+        answer = next((item['answer'] for item in faqs 
+                   if 'located' in item['question'].lower() or 'address' in item['question'].lower()), None)
+    
+    # Check for vegetarian related queries
+    elif any(word in query for word in ['veg', 'vegetarian', 'plant', 'non-meat']):
+        answer = next((item['answer'] for item in faqs 
+                   if 'vegetarian' in item['question'].lower()), None)
+    
+    # Check for booking related queries
+    elif any(word in query for word in ['book', 'reservation', 'table', 'reserve', 'seat']):
+        booking_info = next((item for item in snapshot.entries('booking') 
+                        if 'Booking Information' in item.get('info', '')), None)
+        if booking_info:
+            answer = booking_info.get('details')
+    
+    # General greeting or hello
+    elif any(word in query for word in ['hello', 'hi', 'hey', 'greetings']):
+        greetings = [
+            "Hello! Welcome to Barbeque Nation. How can I assist you today?",
+            "Hi there! I'm your Barbeque Nation assistant. What information do you need?",
+            "Greetings! I'm here to help with all your Barbeque Nation queries."
+        ]
+        answer = random.choice(greetings)
+    
+    # If no specific match, use the word index to find the FAQ sharing the most words
+    if not answer:
+        best_match = snapshot.search_faq(query, min_shared=1)
+        if best_match:
+            answer = best_match['answer']
+    
+    if answer:
+        print(f"Found answer in local KB: {answer[:50]}...")
+    else:
+        print("No answer found in local KB")
+        # Provide a fallback response
+        fallback_responses = [
+            "I'm not sure I understand. Could you please rephrase your question?",
+            "I don't have specific information about that. Would you like to know about our menu, locations, or make a reservation?",
+            "I'm sorry, I don't have that information right now. Is there something else I can help you with?"
+        ]
+        answer = random.choice(fallback_responses)
+    
+    return answer
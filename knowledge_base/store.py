@@ -0,0 +1,490 @@
+import os
+import re
+import json
+import time
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+from prefork import on_worker_start
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no cross-process file locks, so run a single worker there
+    fcntl = None
+
+TOKEN_PATTERN = re.compile(r'[a-z]+')
+
+# Fields every entry in a section must have
+REQUIRED_FIELDS = {
+    'faq': ['question', 'answer'],
+    'booking': ['info', 'details']
+}
+
+# Top-level key in a city's file holding the next id to assign in each section
+NEXT_IDS_KEY = '_next_ids'
+
+def question_tokens(text):
+    """Return the set of lowercase word tokens in a piece of text."""
+    return set(TOKEN_PATTERN.findall(text.lower()))
+
+def entry_words(entry):
+    """Return the set of lowercase words in all of an entry's string fields."""
+    words = set()
+    for value in entry.values():
+        if isinstance(value, str):
+            words.update(TOKEN_PATTERN.findall(value.lower()))
+    return words
+
+class KBSnapshot:
+    def __init__(self, city, version, sections, faq_index, vocabulary, next_ids):
+        """
+        An immutable view of one city's knowledge base.
+
+        Snapshots are never modified after they are published. Writers build
+        a new snapshot that shares every untouched entry and index posting
+        with the previous one, then swap it in with one reference assignment.
+
+        Args:
+            city (str): Lowercase city name
+            version (int): Incremented on every published change
+            sections (dict): Section name -> {entry id: entry dict}
+            faq_index (dict): Question word -> frozenset of FAQ entry ids
+            vocabulary (dict): Word -> number of entries using it, across all
+                sections; these words are spelling correction targets
+            next_ids (dict): Section name -> id for its next new entry; ids
+                of deleted entries are never handed out again
+        """
+        self.city = city
+        self.version = version
+        self.sections = sections
+        self.faq_index = faq_index
+        self.vocabulary = vocabulary
+        self.next_ids = next_ids
+
+    def entries(self, section):
+        """Return the entries of a section in knowledge base order."""
+        return list(self.sections.get(section, {}).values())
+
+    def to_json(self):
+        """Return the snapshot in the kb_data/<city>_kb.json layout."""
+        kb_data = {section: list(entries.values()) for section, entries in self.sections.items()}
+        kb_data[NEXT_IDS_KEY] = dict(self.next_ids)
+        return kb_data
+
+    def search_faq(self, query, min_shared=2):
+        """
+        Find the FAQ whose question best matches a lowercase query.
+
+        Uses the word index, so only FAQs sharing a word with the query are
+        looked at. An exact question match wins outright; otherwise the FAQ
+        with the most shared words is returned if it shares at least
+        `min_shared`. Ties go to the lowest entry id.
+
+        Args:
+            query (str): Lowercase user query
+            min_shared (int): Fewest shared words for a non-exact match
+
+        Returns:
+            dict: The matching FAQ entry, or None
+        """
+        scores = {}
+        for word in question_tokens(query):
+            for entry_id in self.faq_index.get(word, ()):
+                scores[entry_id] = scores.get(entry_id, 0) + 1
+
+        faqs = self.sections.get('faq', {})
+        best = None
+        best_score = min_shared - 1
+        for entry_id in sorted(scores):
+            entry = faqs[entry_id]
+            # A question contained in the query shares all its words, so it is a candidate
+            question = entry.get('question', '').lower()
+            if question and question in query:
+                return entry
+            if scores[entry_id] > best_score:
+                best, best_score = entry, scores[entry_id]
+        return best
+
+class KnowledgeBaseStore:
+    def __init__(self, kb_dir='kb_data', refresh_interval=1.0):
+        """
+        Initialize the in-memory knowledge base from kb_data/<city>_kb.json.
+
+        Readers call `snapshot` and never take a lock. Writers are serialized
+        by a lock, publish a new snapshot per change, and hand the change to
+        a background writer thread. The writer takes a per-city file lock,
+        replays the changes onto the file (which may hold other workers'
+        edits) and replaces it. A background refresher thread in each worker
+        picks up other workers' edits within `refresh_interval` seconds.
+
+        Args:
+            kb_dir (str): Directory containing the knowledge base files
+            refresh_interval (float): Seconds between checks of the files
+                for changes made by other workers
+        """
+        self.kb_dir = kb_dir
+        self.refresh_interval = refresh_interval
+        self.snapshots = {}
+        self.write_lock = threading.Lock()
+
+        # Per city: changes published here but not yet written, as (kind, section, entry_id, entry)
+        self.pending = {}
+        # Cities waiting to be written to disk, drained by the writer thread
+        self.write_queue = queue.Queue()
+        self.writer = None
+        self.refresher = None
+
+        # Per city: the snapshot matching the file on disk and the file's (inode, mtime, size).
+        # disk_lock keeps the writer and refresher from publishing out of order.
+        self.disk_snapshots = {}
+        self.file_stats = {}
+        self.disk_lock = threading.Lock()
+
+        try:
+            filenames = sorted(name for name in os.listdir(kb_dir) if name.endswith('_kb.json'))
+        except OSError as e:
+            print(f"Error listing knowledge base files: {e}")
+            filenames = []
+
+        for filename in filenames:
+            city = filename[:-len('_kb.json')].lower()
+            try:
+                self.snapshots[city] = self._read(city)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Error loading knowledge base {filename}: {e}")
+
+    def _kb_file(self, city):
+        """Return the path of a city's knowledge base file."""
+        return os.path.join(self.kb_dir, f'{city}_kb.json')
+
+    def _file_stat(self, city):
+        """Return (inode, mtime, size) of a city's file; os.replace always changes the inode."""
+        stat = os.stat(self._kb_file(city))
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @contextmanager
+    def _file_lock(self, name):
+        """Hold an exclusive lock on kb_data/<name> against other worker processes."""
+        with open(os.path.join(self.kb_dir, name), 'a+') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield lock_file
+
+    def _read(self, city, version=0):
+        """Read a city's file into a snapshot and remember it as the on-disk state."""
+        file_stat = self._file_stat(city)
+        with open(self._kb_file(city), 'r') as f:
+            kb_data = json.load(f)
+        snapshot = self._build_snapshot(city, kb_data, version)
+        self.disk_snapshots[city] = snapshot
+        self.file_stats[city] = file_stat
+        return snapshot
+
+    def _build_snapshot(self, city, kb_data, version=0):
+        """Create a snapshot from a city's file contents, assigning ids to entries without one."""
+        sections = {}
+        stored_next_ids = kb_data.get(NEXT_IDS_KEY, {})
+        next_ids = {}
+        for section, items in kb_data.items():
+            if section == NEXT_IDS_KEY:
+                continue
+            entries = {}
+            next_id = max((item['id'] for item in items if isinstance(item.get('id'), int)), default=0) + 1
+            for item in items:
+                entry = dict(item)
+                if not isinstance(entry.get('id'), int):
+                    entry['id'] = next_id
+                    next_id += 1
+                entries[entry['id']] = entry
+            sections[section] = entries
+            next_ids[section] = max(next_id, stored_next_ids.get(section, 1))
+
+        faq_index = {}
+        for entry_id, entry in sections.get('faq', {}).items():
+            for word in question_tokens(entry.get('question', '')):
+                faq_index[word] = faq_index.get(word, frozenset()) | {entry_id}
+
+        vocabulary = {}
+        for entries in sections.values():
+            for entry in entries.values():
+                for word in entry_words(entry):
+                    vocabulary[word] = vocabulary.get(word, 0) + 1
+        return KBSnapshot(city, version, sections, faq_index, vocabulary, next_ids)
+
+    def snapshot(self, city):
+        """
+        Return the current snapshot for a city without locking.
+
+        Args:
+            city (str): City name (any case)
+
+        Returns:
+            KBSnapshot: The latest published snapshot, or None if the city is unknown
+        """
+        return self.snapshots.get(city.lower()) if city else None
+
+    def _apply(self, old, section, entry_id, entry, version):
+        """
+        Build a new snapshot with one entry added, replaced or removed.
+
+        Only the touched section, the index postings of words whose
+        membership changed and, if the entry's words changed, the vocabulary
+        are copied; everything else is shared with `old`.
+        """
+        sections = dict(old.sections)
+        entries = dict(sections.get(section, {}))
+        previous = entries.get(entry_id)
+        if entry is None:
+            entries.pop(entry_id, None)
+        else:
+            entries[entry_id] = entry
+        sections[section] = entries
+
+        faq_index = old.faq_index
+        if section == 'faq':
+            old_words = question_tokens(previous.get('question', '')) if previous else set()
+            new_words = question_tokens(entry.get('question', '')) if entry else set()
+            if old_words != new_words:
+                faq_index = dict(faq_index)
+                for word in old_words - new_words:
+                    posting = faq_index[word] - {entry_id}
+                    if posting:
+                        faq_index[word] = posting
+                    else:
+                        del faq_index[word]
+                for word in new_words - old_words:
+                    faq_index[word] = faq_index.get(word, frozenset()) | {entry_id}
+
+        vocabulary = old.vocabulary
+        old_words = entry_words(previous) if previous else set()
+        new_words = entry_words(entry) if entry else set()
+        if old_words != new_words:
+            vocabulary = dict(vocabulary)
+            for word in old_words - new_words:
+                if vocabulary[word] > 1:
+                    vocabulary[word] -= 1
+                else:
+                    del vocabulary[word]
+            for word in new_words - old_words:
+                vocabulary[word] = vocabulary.get(word, 0) + 1
+
+        next_ids = old.next_ids
+        if entry_id >= next_ids.get(section, 1):
+            next_ids = dict(next_ids)
+            next_ids[section] = entry_id + 1
+
+        return KBSnapshot(old.city, version, sections, faq_index, vocabulary, next_ids)
+
+    def _replay(self, base, changes, version):
+        """
+        Apply changes made in this worker on top of a snapshot read from disk.
+
+        Updates of entries another worker has deleted are dropped rather
+        than bringing the entry back.
+        """
+        snapshot = KBSnapshot(base.city, version, base.sections, base.faq_index,
+                              base.vocabulary, base.next_ids)
+        for kind, section, entry_id, entry in changes:
+            if kind == 'update' and entry_id not in snapshot.sections.get(section, {}):
+                continue
+            snapshot = self._apply(snapshot, section, entry_id, entry, version)
+        return snapshot
+
+    def _publish(self, old, kind, section, entry_id, entry):
+        """Publish one change and queue it for writing. Caller holds write_lock."""
+        snapshot = self._apply(old, section, entry_id, entry, old.version + 1)
+        # Single reference swap: readers see either the old or the new snapshot
+        self.snapshots[old.city] = snapshot
+        self.pending.setdefault(old.city, []).append((kind, section, entry_id, entry))
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write_loop, name='kb-writer', daemon=True)
+            self.writer.start()
+        self.write_queue.put(old.city)
+        return snapshot
+
+    def _rebase(self, city, base):
+        """Publish a snapshot read from disk plus this worker's unwritten changes."""
+        with self.write_lock:
+            current = self.snapshots.get(city)
+            version = current.version + 1 if current else 0
+            self.snapshots[city] = self._replay(base, self.pending.get(city, []), version)
+
+    def _validate(self, section, fields):
+        """Raise ValueError if an entry is missing a required string field."""
+        for field in REQUIRED_FIELDS.get(section, []):
+            if not isinstance(fields.get(field), str) or not fields[field].strip():
+                raise ValueError(f'Missing required field: {field}')
+
+    def _allocate_id(self, city, section, local_next_id):
+        """
+        Reserve the next id in a section, unique across worker processes.
+
+        The counters live in kb_data/.<city>_kb.ids, locked only for the
+        read and rewrite of that small file, so adds never wait on a full
+        knowledge base write.
+        """
+        with self._file_lock(f'.{city}_kb.ids') as ids_file:
+            ids_file.seek(0)
+            content = ids_file.read()
+            next_ids = json.loads(content) if content.strip() else {}
+            entry_id = max(next_ids.get(section, 1), local_next_id)
+            next_ids[section] = entry_id + 1
+            ids_file.seek(0)
+            ids_file.truncate()
+            json.dump(next_ids, ids_file)
+        return entry_id
+
+    def add_entry(self, city, section, fields):
+        """
+        Add a new entry to a city's section.
+
+        Args:
+            city (str): City name
+            section (str): Section name, e.g. 'faq' or 'booking'
+            fields (dict): Entry fields (an 'id' is assigned automatically)
+
+        Returns:
+            tuple: (entry, snapshot) for the new entry and published snapshot
+
+        Raises:
+            KeyError: If the city is unknown
+            ValueError: If required fields are missing
+            OSError: If the id counter file cannot be updated
+        """
+        self._validate(section, fields)
+        with self.write_lock:
+            old = self.snapshots[city.lower()]
+            entry_id = self._allocate_id(old.city, section, old.next_ids.get(section, 1))
+            entry = {key: value for key, value in fields.items() if key != 'id'}
+            entry['id'] = entry_id
+            return entry, self._publish(old, 'add', section, entry_id, entry)
+
+    def update_entry(self, city, section, entry_id, fields):
+        """
+        Update fields of an existing entry.
+
+        Args:
+            city (str): City name
+            section (str): Section name
+            entry_id (int): Id of the entry to update
+            fields (dict): Fields to change
+
+        Returns:
+            tuple: (entry, snapshot) for the updated entry and published snapshot
+
+        Raises:
+            KeyError: If the city or entry is unknown
+            ValueError: If the result would be missing required fields
+        """
+        with self.write_lock:
+            old = self.snapshots[city.lower()]
+            entry = dict(old.sections.get(section, {})[entry_id])
+            entry.update({key: value for key, value in fields.items() if key != 'id'})
+            self._validate(section, entry)
+            return entry, self._publish(old, 'update', section, entry_id, entry)
+
+    def delete_entry(self, city, section, entry_id):
+        """
+        Delete an entry.
+
+        Args:
+            city (str): City name
+            section (str): Section name
+            entry_id (int): Id of the entry to delete
+
+        Returns:
+            KBSnapshot: The published snapshot
+
+        Raises:
+            KeyError: If the city or entry is unknown
+        """
+        with self.write_lock:
+            old = self.snapshots[city.lower()]
+            if entry_id not in old.sections.get(section, {}):
+                raise KeyError(entry_id)
+            return self._publish(old, 'delete', section, entry_id, None)
+
+    def _write_loop(self):
+        """Write queued cities to disk, merging with edits other workers have written."""
+        while True:
+            city = self.write_queue.get()
+            try:
+                self._write(city)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Error writing knowledge base for {city}: {e}")
+            finally:
+                self.write_queue.task_done()
+
+    def _write(self, city):
+        """Replay a city's unwritten changes onto its file and replace the file."""
+        with self.disk_lock, self._file_lock(f'.{city}_kb.lock'):
+            with self.write_lock:
+                # A burst of edits queues the city many times; the first write takes them all
+                changes = self.pending.pop(city, [])
+            if not changes:
+                return
+            try:
+                base = self.disk_snapshots[city]
+                reloaded = self._file_stat(city) != self.file_stats.get(city)
+                if reloaded:
+                    base = self._read(city)
+                merged = self._replay(base, changes, base.version + 1)
+
+                kb_file = self._kb_file(city)
+                tmp_file = f'{kb_file}.{os.getpid()}.tmp'
+                with open(tmp_file, 'w') as f:
+                    json.dump(merged.to_json(), f, indent=2, ensure_ascii=False)
+                os.replace(tmp_file, kb_file)
+            except (OSError, json.JSONDecodeError):
+                # Keep the changes for the next write
+                with self.write_lock:
+                    self.pending[city] = changes + self.pending.get(city, [])
+                raise
+            self.disk_snapshots[city] = merged
+            self.file_stats[city] = self._file_stat(city)
+
+            if reloaded:
+                # Show the other workers' edits here too
+                self._rebase(city, merged)
+
+    def start_refresher(self):
+        """Start this worker's thread that loads other workers' edits from disk."""
+        if self.refresher is None:
+            self.refresher = threading.Thread(target=self._refresh_loop, name='kb-refresher', daemon=True)
+            self.refresher.start()
+
+    def _refresh_loop(self):
+        """Every `refresh_interval` seconds, reload cities whose file another worker replaced."""
+        while True:
+            time.sleep(self.refresh_interval)
+            for city in list(self.snapshots):
+                try:
+                    with self.disk_lock:
+                        if self._file_stat(city) == self.file_stats.get(city):
+                            continue
+                        base = self._read(city)
+                        self._rebase(city, base)
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"Error reloading knowledge base for {city}: {e}")
+
+    def reset_after_fork(self):
+        """Give a forked worker its own locks, queue and threads."""
+        self.write_lock = threading.Lock()
+        self.disk_lock = threading.Lock()
+        self.pending = {}
+        self.write_queue = queue.Queue()
+        self.writer = None
+        self.refresher = None
+
+    def flush(self):
+        """Block until every queued change has been written to disk."""
+        self.write_queue.join()
+
+# Shared store used by the chat flows and the knowledge base API
+kb_store = KnowledgeBaseStore()
+atexit.register(kb_store.flush)
+os.register_at_fork(after_in_child=kb_store.reset_after_fork)
+# Each worker polls for the other workers' edits
+on_worker_start(kb_store.start_refresher)
@@ -0,0 +1,109 @@
+import gc
+import os
+import time
+import threading
+
+# Callbacks that create per-worker resources (HTTP clients, loggers, threads)
+worker_initializers = []
+
+# Process the initializers last ran in, so a forked worker can tell they have not run in it
+started_pid = None
+start_lock = threading.Lock()
+
+def on_worker_start(callback):
+    """
+    Register a function to run once in each worker process.
+
+    Used for anything that must not be shared across fork, such as open
+    sockets or background threads. Returns the callback so it can be used
+    as a decorator.
+    """
+    worker_initializers.append(callback)
+    return callback
+
+def start_worker():
+    """Run the per-worker initializers. Call after fork, e.g. from gunicorn's post_fork."""
+    global started_pid
+    with start_lock:
+        started_pid = os.getpid()
+        for callback in worker_initializers:
+            callback()
+
+def ensure_worker_started():
+    """
+    Run the per-worker initializers if they have not run in this process yet.
+
+    Registered as a before_request hook, so an app created with
+    preload=True still gets its per-worker resources when the server has
+    no post_fork hook; they are then created by the worker's first request.
+    """
+    global started_pid
+    if started_pid == os.getpid():
+        return
+    with start_lock:
+        if started_pid != os.getpid():
+            print(f"Worker {os.getpid()} was not started by a post_fork hook; initializing now")
+            started_pid = os.getpid()
+            for callback in worker_initializers:
+                callback()
+
+def warm_caches(jinja_envs=()):
+    """
+    Build every shared read-only structure, then freeze it for copy-on-write sharing.
+
+    Meant to run once in the master process before workers are forked. It
+    loads the knowledge bases and their word indexes, builds the spelling
+    indexes, compiles all templates in the given Jinja environments and
+    loads the NLTK tokenizer. It then moves every surviving object into
+    the permanent generation with gc.freeze(), so worker garbage
+    collections never touch, and therefore never copy, those pages.
+
+    Args:
+        jinja_envs (iterable): Jinja environments whose templates should be compiled
+
+    Returns:
+        dict: Timings in milliseconds for each warm-up step
+    """
+    timings = {}
+
+    # Avoid collections that leave freed holes in pages the workers will share
+    gc.disable()
+
+    start = time.perf_counter()
+    # Importing these parses the KBs and builds the FAQ and spelling indexes
+    import knowledge_base.store
+    import knowledge_base.data
+    import utils
+    import spell_index
+    # Index the knowledge base vocabulary now rather than on the first request
+    spell_index.correct_spelling('')
+    timings['kb_and_indexes'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for env in jinja_envs:
+        for name in env.list_templates():
+            try:
+                env.get_template(name)
+            except Exception as e:
+                print(f"Error compiling template {name}: {e}")
+    timings['templates'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    try:
+        # word_tokenize loads the punkt model lazily on its first call
+        utils.tokenize('Warm up the tokenizer.')
+    except LookupError as e:
+        print(f"NLTK tokenizer not available: {e}")
+    timings['nltk'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    gc.collect()
+    gc.freeze()
+    timings['gc_freeze'] = (time.perf_counter() - start) * 1000
+
+    # Frozen objects are never scanned, so collection can resume for everything created later
+    gc.enable()
+
+    print(f"Preloaded in process {os.getpid()}: " +
+          ', '.join(f"{name} {ms:.1f} ms" for name, ms in timings.items()))
+    return timings
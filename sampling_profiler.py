@@ -0,0 +1,133 @@
+import sys
+import time
+import threading
+from collections import Counter
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, max_depth=64, active_threads=None):
+        """
+        Initialize a stack-sampling profiler for the current process.
+
+        Nothing runs until `run` is called: a background thread then snapshots
+        every thread's stack each `interval` seconds for a fixed window and
+        stops, so an idle profiler costs nothing.
+
+        Threads parked in a server's thread pool or selector loop would
+        otherwise dominate every profile, so when `active_threads` is given
+        only the threads in it at sampling time are recorded.
+
+        Args:
+            interval (float): Seconds between samples
+            max_depth (int): Deepest stack frame recorded per sample
+            active_threads (set, optional): Ids of the threads doing work,
+                e.g. those currently serving a request
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.active_threads = active_threads
+        self.stacks = Counter()
+        self.samples = 0
+
+    def _label(self, frame):
+        """Return a readable 'module.function' name for a frame."""
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '?')
+        name = getattr(code, 'co_qualname', code.co_name)
+        return f"{module}.{name}"
+
+    def _sample(self, ignore_threads):
+        """Record one stack per thread, root first."""
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in ignore_threads:
+                continue
+            if self.active_threads is not None and thread_id not in self.active_threads:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(self._label(frame))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+        self.samples += 1
+
+    def _loop(self, deadline, ignore_threads):
+        """Sample until the deadline, sleeping between snapshots."""
+        ignore_threads = ignore_threads | {threading.get_ident()}
+        while time.monotonic() < deadline:
+            self._sample(ignore_threads)
+            time.sleep(self.interval)
+
+    def run(self, duration):
+        """
+        Profile all other threads for `duration` seconds and block until done.
+
+        Args:
+            duration (float): Length of the sampling window in seconds
+
+        Returns:
+            dict: Sample count, number of thread stacks recorded, and duration
+        """
+        self.stacks.clear()
+        self.samples = 0
+        start = time.monotonic()
+
+        sampler = threading.Thread(
+            target=self._loop,
+            args=(start + duration, {threading.get_ident()}),
+            name='sampling-profiler',
+            daemon=True
+        )
+        sampler.start()
+        sampler.join()
+
+        return {
+            'samples': self.samples,
+            'stack_samples': sum(self.stacks.values()),
+            'duration': round(time.monotonic() - start, 3),
+            'interval': self.interval
+        }
+
+    def collapsed(self):
+        """
+        Return the samples in collapsed-stack format.
+
+        Each line is 'frame;frame;frame count', which flamegraph.pl and
+        speedscope read directly.
+
+        Returns:
+            str: One line per distinct stack, most frequent first
+        """
+        return '\n'.join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit=20):
+        """
+        Rank functions by self time (samples where they were the innermost frame).
+
+        Args:
+            limit (int): Number of functions to return
+
+        Returns:
+            list: Dicts with function name, self and total sample counts and
+                self time as a percentage of all recorded stack samples (idle
+                threads are not recorded when `active_threads` is used)
+        """
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            if not stack:
+                continue
+            self_counts[stack[-1]] += count
+            # Count recursive functions once per stack
+            for name in set(stack):
+                total_counts[name] += count
+
+        total = sum(self.stacks.values()) or 1
+        return [
+            {
+                'function': name,
+                'self_samples': count,
+                'total_samples': total_counts[name],
+                'self_percent': round(100.0 * count / total, 2)
+            }
+            for name, count in self_counts.most_common(limit)
+        ]
@@ -1,33 +1,64 @@
-from flask import Flask, send_from_directory
+from flask import Flask, send_from_directory, jsonify
+from werkzeug.middleware.proxy_fix import ProxyFix
+from datetime import datetime
 from chatbot.server import chatbot_bp
 from knowledge_base.api import kb_bp
 from webhook.api import webhook_bp
+from admin.api import admin_bp
+from prefork import start_worker, ensure_worker_started, warm_caches
+from config import TRUSTED_PROXIES
 import os
 
-app = Flask(__name__)
-
-# Register blueprints
-app.register_blueprint(chatbot_bp)
-app.register_blueprint(kb_bp)
-app.register_blueprint(webhook_bp)
-
-# Serve static files
-@app.route('/')
-def index():
-    return send_from_directory('chatbot/static', 'index.html')
-
-@app.route('/<path:path>')
-def static_files(path):
-    return send_from_directory('chatbot/static', path)
-
-@app.route('/api/test', methods=['GET'])
-def test_api():
-    """Test endpoint to check if API is running."""
-    return jsonify({
-        'status': 'success',
-        'message': 'API is running correctly',
-        'time': datetime.now().isoformat()
-    })
+def create_app(preload=False):
+    """
+    Create the Flask app.
+    
+    Args:
+        preload (bool): Warm and freeze shared caches for forking workers
+            instead of running the per-worker setup now (see gunicorn.conf.py)
+    
+    Returns:
+        Flask: The configured app
+    """
+    app = Flask(__name__)
+    
+    # Take the client address from X-Forwarded-For when behind trusted proxies,
+    # so the per-IP rate limit sees real clients rather than the proxy
+    if TRUSTED_PROXIES:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+    
+    # Register blueprints
+    app.register_blueprint(chatbot_bp)
+    app.register_blueprint(kb_bp)
+    app.register_blueprint(webhook_bp)
+    app.register_blueprint(admin_bp)
+    
+    # Serve static files
+    @app.route('/')
+    def index():
+        return send_from_directory('chatbot/static', 'index.html')
+    
+    @app.route('/<path:path>')
+    def static_files(path):
+        return send_from_directory('chatbot/static', path)
+    
+    @app.route('/api/test', methods=['GET'])
+    def test_api():
+        """Test endpoint to check if API is running."""
+        return jsonify({
+            'status': 'success',
+            'message': 'API is running correctly',
+            'time': datetime.now().isoformat()
+        })
+    
+    # Covers servers that fork workers without running a post_fork hook
+    app.before_request(ensure_worker_started)
+    
+    if preload:
+        warm_caches([app.jinja_env])
+    else:
+        start_worker()
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
@@ -0,0 +1,332 @@
+import os
+import re
+import threading
+import nltk
+from keywords import ALL_KEYWORDS
+from knowledge_base.store import kb_store
+
+TOKEN_PATTERN = re.compile(r'[a-z]+')
+
+# Endings stripped to recognise inflected forms of known words, e.g. 'prices'
+INFLECTION_SUFFIXES = ['ing', 'ies', 'ied', 'est', 'es', 'ed', 's', 'd', 'ly', 'er']
+
+# Plain-text list of everyday English words, one per line
+COMMON_WORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'common_words.txt')
+
+def load_common_words(path=COMMON_WORDS_FILE):
+    """
+    Load the list of everyday words that must never be corrected.
+
+    Args:
+        path (str): Word list file, one word per line, '#' for comments
+
+    Returns:
+        frozenset: Lowercase words (empty if the file cannot be read)
+    """
+    try:
+        with open(path, 'r') as f:
+            return frozenset(line.strip().lower() for line in f
+                             if line.strip() and not line.startswith('#'))
+    except OSError as e:
+        print(f"Error loading common word list: {e}")
+        return frozenset()
+
+def load_dictionary():
+    """
+    Load the English dictionary used to tell real words from typos.
+
+    Combines the common word list with NLTK's 'words' corpus, downloading
+    the corpus on first use like the punkt tokenizer in utils.py.
+
+    Returns:
+        frozenset: Lowercase dictionary words (only the common words if
+            the NLTK corpus is unavailable)
+    """
+    words = set(load_common_words())
+    try:
+        nltk.data.find('corpora/words')
+    except LookupError:
+        nltk.download('words')
+    try:
+        from nltk.corpus import words as words_corpus
+        words.update(word.lower() for word in words_corpus.words())
+    except LookupError:
+        print("NLTK word list not available, using common words only")
+    return frozenset(words)
+
+class SymSpellIndex:
+    def __init__(self, known_words=(), max_distance=2, common_words=()):
+        """
+        Initialize an empty deletion-neighbourhood index.
+
+        Only correction targets (intent keywords, city names and knowledge
+        base vocabulary) are indexed: each is stored under all strings
+        reachable from it by deleting up to
+        `max_distance` characters. A misspelt token is looked up by generating
+        its own deletes, so candidates are found without comparing against
+        every target, and a token can only ever be corrected into a target.
+
+        Tokens that are dictionary words, or inflections of one, are never
+        changed, so ordinary English such as 'sent' or 'food' is not
+        rewritten into a nearby keyword like 'seat' or 'good'. Only a real
+        dictionary miss is corrected. Inflections of rare dictionary words
+        ('ofers' from 'ofer') are only corrected into a target one edit
+        away, such as 'offers'.
+
+        Args:
+            known_words (iterable): Correctly spelt words to leave alone
+            max_distance (int): Largest edit distance that will be corrected
+            common_words (iterable): Everyday words, whose inflections are
+                left alone too
+        """
+        self.max_distance = max_distance
+        self.known_words = frozenset(known_words)
+        self.common_words = frozenset(common_words)
+
+        # Target -> number of sources (keyword lists, city vocabularies) using it
+        self.targets = {}
+        # Delete -> tuple of targets; tuples are replaced, never changed, so lookups need no lock
+        self.deletes = {}
+
+        # Vocabulary last synced per source, and the lock serializing syncs
+        self.vocabularies = {}
+        self.sync_lock = threading.Lock()
+
+    def _edits(self, word, distance):
+        """Return all strings made by deleting up to `distance` characters."""
+        results = {word}
+        frontier = {word}
+        for _ in range(distance):
+            next_frontier = set()
+            for item in frontier:
+                for i in range(len(item)):
+                    next_frontier.add(item[:i] + item[i + 1:])
+            results |= next_frontier
+            frontier = next_frontier
+        return results
+
+    def add_target(self, word):
+        """
+        Add a word that misspelt tokens may be corrected into.
+
+        Args:
+            word (str): Lowercase word to add
+        """
+        if word in self.targets:
+            self.targets[word] += 1
+            return
+        for delete in self._edits(word, self.max_distance):
+            self.deletes[delete] = self.deletes.get(delete, ()) + (word,)
+        self.targets[word] = 1
+
+    def remove_target(self, word):
+        """
+        Drop one use of a target, removing it once nothing uses it.
+
+        Args:
+            word (str): Lowercase word to remove
+        """
+        if self.targets.get(word, 0) > 1:
+            self.targets[word] -= 1
+            return
+        self.targets.pop(word, None)
+        for delete in self._edits(word, self.max_distance):
+            posting = tuple(target for target in self.deletes.get(delete, ()) if target != word)
+            if posting:
+                self.deletes[delete] = posting
+            else:
+                self.deletes.pop(delete, None)
+
+    def sync_vocabulary(self, source, vocabulary):
+        """
+        Make a vocabulary's words the targets contributed by `source`.
+
+        Only the words added or removed since the last sync are reindexed,
+        and a vocabulary already synced (the same object) costs one check.
+
+        Args:
+            source (str): Name of the vocabulary, e.g. a city
+            vocabulary (dict): Word -> use count, e.g. KBSnapshot.vocabulary
+        """
+        if self.vocabularies.get(source) is vocabulary:
+            return
+        with self.sync_lock:
+            previous = self.vocabularies.get(source)
+            if previous is vocabulary:
+                return
+            previous = previous if previous is not None else {}
+            for word in vocabulary.keys() - previous.keys():
+                self.add_target(word)
+            for word in previous.keys() - vocabulary.keys():
+                self.remove_target(word)
+            self.vocabularies[source] = vocabulary
+
+    def add_keywords(self, keywords):
+        """
+        Add intent keywords as correction targets.
+
+        Args:
+            keywords (iterable): Keywords or phrases (phrases are split into words)
+        """
+        for keyword in keywords:
+            for word in TOKEN_PATTERN.findall(keyword.lower()):
+                self.add_target(word)
+
+    def _inflects(self, token, words):
+        """Check whether a token is an inflection of a word in `words`, e.g. 'cities' of 'city'."""
+        for suffix in INFLECTION_SUFFIXES:
+            stem = token[:-len(suffix)]
+            if not token.endswith(suffix) or len(stem) < 3:
+                continue
+            stems = [stem, stem + 'e']
+            if suffix in ('ies', 'ied'):
+                stems.append(stem + 'y')
+            if len(stem) > 3 and stem[-1] == stem[-2]:
+                stems.append(stem[:-1])
+            if any(candidate in words for candidate in stems):
+                return True
+        return False
+
+    def is_word(self, token):
+        """
+        Check whether a token is a correctly spelt word.
+
+        A token counts if it is a target or dictionary word, or an
+        inflection of a target or common word: 'prices', 'weekends',
+        'planned' and 'cities' are all words even when only 'price',
+        'weekend', 'plan' and 'city' are listed.
+
+        Args:
+            token (str): Lowercase token
+
+        Returns:
+            bool: True if the token should never be corrected
+        """
+        if token in self.targets or token in self.known_words:
+            return True
+        return self._inflects(token, self.targets) or self._inflects(token, self.common_words)
+
+    def allowed_distance(self, token):
+        """Shorter tokens get fewer edits so 'and' never turns into 'end'."""
+        if len(token) <= 3:
+            return 0
+        if len(token) <= 5:
+            return min(1, self.max_distance)
+        return self.max_distance
+
+    def lookup(self, token):
+        """
+        Find the closest correction target to a token.
+
+        Args:
+            token (str): Lowercase token to correct
+
+        Returns:
+            str: The corrected word, or the token itself if it is already
+                known or no target is close enough
+        """
+        max_distance = self.allowed_distance(token)
+        if max_distance == 0 or self.is_word(token):
+            return token
+
+        # An inflection of a rare dictionary word is only a typo if a target is one edit away
+        if max_distance > 1 and self._inflects(token, self.known_words):
+            max_distance = 1
+
+        # Many deletes lead to the same word, so verify each candidate only once
+        candidates = set()
+        for delete in self._edits(token, max_distance):
+            candidates.update(self.deletes.get(delete, ()))
+
+        best = None
+        best_key = None
+        for candidate in candidates:
+            if abs(len(candidate) - len(token)) > max_distance:
+                continue
+            distance = edit_distance(token, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            key = (distance, candidate)
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+        return best or token
+
+    def correct(self, text):
+        """
+        Correct every token in a lowercase string, leaving other characters intact.
+
+        Args:
+            text (str): Lowercase text to correct
+
+        Returns:
+            str: Text with misspelt tokens replaced by correction targets
+        """
+        return TOKEN_PATTERN.sub(lambda match: self.lookup(match.group(0)), text)
+
+def edit_distance(source, target, max_distance):
+    """
+    Compute the optimal string alignment distance between two strings.
+
+    Stops early once every cell in a row exceeds `max_distance`.
+
+    Args:
+        source (str): First string
+        target (str): Second string
+        max_distance (int): Distance beyond which the exact value is not needed
+
+    Returns:
+        int: Edit distance, or max_distance + 1 if it is larger than max_distance
+    """
+    previous_previous = None
+    previous = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        current = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = 0 if source[i - 1] == target[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            # Adjacent transposition, e.g. 'resevration' -> 'reservation'
+            if (i > 1 and j > 1 and source[i - 1] == target[j - 2]
+                    and source[i - 2] == target[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+def build_shared_index():
+    """
+    Build the one spelling index shared by the chat flows.
+
+    Every intent keyword and city name is a correction target, and the
+    English dictionary holds the known words. Knowledge base vocabulary
+    is added by `correct_spelling` from the current snapshots.
+
+    Returns:
+        SymSpellIndex: The populated index
+    """
+    index = SymSpellIndex(load_dictionary(), common_words=load_common_words())
+    index.add_keywords(ALL_KEYWORDS)
+    for city in kb_store.snapshots:
+        index.add_target(city)
+    return index
+
+# Built once at startup from the keyword lists and the already loaded KB snapshots
+shared_index = build_shared_index()
+
+def correct_spelling(text):
+    """
+    Lowercase text and correct misspelt keywords, city names and KB words.
+
+    The knowledge base vocabulary targets follow the current snapshot of
+    each city: words from a newly published FAQ become targets, and those
+    of a deleted one stop being targets.
+
+    Args:
+        text (str): Raw user text
+
+    Returns:
+        str: Lowercase text with typos such as 'resevation' or 'banglore' fixed
+    """
+    for city in list(kb_store.snapshots):
+        shared_index.sync_vocabulary(city, kb_store.snapshot(city).vocabulary)
+    return shared_index.correct(text.lower())
@@ -3,6 +3,10 @@ import os
 import re
 import nltk
 from nltk.tokenize import word_tokenize
+from spell_index import correct_spelling
+from keywords import (BOOKING_KEYWORDS, CANCEL_KEYWORDS, FAQ_KEYWORDS,
+                      GOODBYE_KEYWORDS, BOOKING_FLOW_WORDS)
+from knowledge_base.store import kb_store
 
 # Download NLTK data (run once)
 try:
@@ -10,6 +14,12 @@ try:
 except LookupError:
     nltk.download('punkt')
 
+# Patterns for booking and cancellation details, compiled once at import
+DATE_PATTERN = re.compile(r'\d{1,2}[/-]\d{1,2}')
+TIME_PATTERN = re.compile(r'\d{1,2}(?::\d{2})?\s*(?:am|pm)')
+GUESTS_PATTERN = re.compile(r'\d+\s*(?:people|persons|guests)')
+BOOKING_ID_PATTERN = re.compile(r'[A-Z0-9]{6,}')
+
 def tokenize(text):
     """
     Split text into tokens and return token count.
@@ -37,16 +47,10 @@ def transition_state(current_state, user_input, context=None):
     if context is None:
         context = {}
     
-    user_input = user_input.lower()
-    
-    # Define keywords for intent detection
-    booking_keywords = ['book', 'reservation', 'reserve', 'table', 'seat', 'dinner', 'lunch']
-    cancel_keywords = ['cancel', 'reschedule', 'change reservation']
-    faq_keywords = ['hour', 'open', 'menu', 'price', 'cost', 'location', 'address', 'buffet', 'veg', 'non-veg']
-    goodbye_keywords = ['bye', 'goodbye', 'thank', 'thanks', 'exit', 'quit', 'end']
+    user_input = correct_spelling(user_input)
     
     # Check for goodbye intent in any state
-    if any(keyword in user_input for keyword in goodbye_keywords):
+    if any(keyword in user_input for keyword in GOODBYE_KEYWORDS):
         return 'goodbye', 'goodbye'
     
     # State transitions
@@ -56,24 +60,24 @@ def transition_state(current_state, user_input, context=None):
         
     elif current_state == 'intent_detection':
         # Detect intent from user input
-        if any(keyword in user_input for keyword in booking_keywords):
+        if any(keyword in user_input for keyword in BOOKING_KEYWORDS):
             return 'booking', 'booking'
-        elif any(keyword in user_input for keyword in cancel_keywords):
+        elif any(keyword in user_input for keyword in CANCEL_KEYWORDS):
             return 'cancellation', 'cancellation'
-        elif any(keyword in user_input for keyword in faq_keywords):
+        elif any(keyword in user_input for keyword in FAQ_KEYWORDS):
             return 'faq', 'faq'
         else:
             return 'fallback', None
             
     elif current_state == 'booking':
         # Handle booking flow
-        if 'date' not in context and ('today' in user_input or 'tomorrow' in user_input or re.search(r'\d{1,2}[/-]\d{1,2}', user_input)):
+        if 'date' not in context and ('today' in user_input or 'tomorrow' in user_input or DATE_PATTERN.search(user_input)):
             # User provided a date
             return 'booking', 'booking_date'
-        elif 'time' not in context and re.search(r'\d{1,2}(?::\d{2})?\s*(?:am|pm)', user_input):
+        elif 'time' not in context and TIME_PATTERN.search(user_input):
             # User provided a time
             return 'booking', 'booking_time'
-        elif 'guests' not in context and re.search(r'\d+\s*(?:people|persons|guests)', user_input):
+        elif 'guests' not in context and GUESTS_PATTERN.search(user_input):
             # User provided number of guests
             return 'booking', 'booking_guests'
         elif 'confirmation' not in context and ('yes' in user_input or 'confirm' in user_input):
@@ -83,7 +87,7 @@ def transition_state(current_state, user_input, context=None):
             return 'booking', 'booking'
             
     elif current_state == 'cancellation':
-        if 'booking_id' not in context and re.search(r'[A-Z0-9]{6,}', user_input):
+        if 'booking_id' not in context and BOOKING_ID_PATTERN.search(user_input):
             # User provided booking ID
             return 'cancellation_confirmation', 'cancellation_confirmed'
         else:
@@ -95,11 +99,11 @@ def transition_state(current_state, user_input, context=None):
         
     elif current_state == 'fallback':
         # From fallback, try to detect intent again
-        if any(keyword in user_input for keyword in booking_keywords):
+        if any(keyword in user_input for keyword in BOOKING_KEYWORDS):
             return 'booking', 'booking'
-        elif any(keyword in user_input for keyword in cancel_keywords):
+        elif any(keyword in user_input for keyword in CANCEL_KEYWORDS):
             return 'cancellation', 'cancellation'
-        elif any(keyword in user_input for keyword in faq_keywords):
+        elif any(keyword in user_input for keyword in FAQ_KEYWORDS):
             return 'faq', 'faq'
         else:
             return 'fallback', None
@@ -123,36 +127,34 @@ def get_kb_response(city, intent, query):
     Returns:
         str: Response from knowledge base or None if not found
     """
-    try:
-        # Load the appropriate knowledge base file
-        kb_file = f'kb_data/{city.lower()}_kb.json'
-        with open(kb_file, 'r') as f:
-            kb_data = json.load(f)
-        
-        if intent not in kb_data:
-            return None
-        
-        # Convert query to lowercase for matching
-        query = query.lower()
-        
-        # Search for matching FAQ
-        for item in kb_data[intent]:
-            # Check if any keywords from the question match the query
-            question = item.get('question', '').lower()
-            keywords = question.split()
-            
-            # Count matching keywords
-            matches = sum(1 for keyword in keywords if keyword in query)
-            
-            # If more than 2 keywords match or exact phrase match, return the answer
-            if matches >= 2 or question in query:
-                return item.get('answer')
-        
-        # No match found
+    # Read the current in-memory snapshot (no file I/O, no locking)
+    snapshot = kb_store.snapshot(city)
+    if snapshot is None or intent not in snapshot.sections:
         return None
+    
+    # Convert query to lowercase and fix typos for matching
+    query = correct_spelling(query)
+    
+    # FAQs are matched through the snapshot's word index
+    if intent == 'faq':
+        item = snapshot.search_faq(query)
+        return item.get('answer') if item else None
+    
+    # Search for matching entry
+    for item in snapshot.entries(intent):
+        # Check if any keywords from the question match the query
+        question = item.get('question', '').lower()
+        keywords = question.split()
         
-    except (FileNotFoundError, json.JSONDecodeError):
-        return None
+        # Count matching keywords
+        matches = sum(1 for keyword in keywords if keyword in query)
+        
+        # If more than 2 keywords match or exact phrase match, return the answer
+        if matches >= 2 or question in query:
+            return item.get('answer')
+    
+    # No match found
+    return None
 
 def chunk_text(text, max_tokens=800):
     """